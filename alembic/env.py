@@ -5,6 +5,8 @@ from sqlalchemy import pool
 
 from alembic import context
 from app.models.user_model import Base  # adjust "myapp.models" to the actual location of your Base
+from app.models import refresh_token_model  # noqa: F401  registers the refresh_tokens table
+from app.models import user_count_model  # noqa: F401  registers user_counts and its triggers
 
 
 # this is the Alembic Config object, which provides
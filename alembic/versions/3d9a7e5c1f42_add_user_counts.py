@@ -0,0 +1,56 @@
+"""add trigger-maintained user_counts
+
+Revision ID: 3d9a7e5c1f42
+Revises: 8c1f3a6e2b70
+Create Date: 2026-10-18 12:25:03.118472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d9a7e5c1f42'
+down_revision: Union[str, None] = '8c1f3a6e2b70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_counts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+    CREATE OR REPLACE FUNCTION user_counts_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE user_counts SET total = total + (SELECT count(*) FROM new_rows) WHERE id = 1;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE user_counts SET total = total - (SELECT count(*) FROM old_rows) WHERE id = 1;
+        ELSE
+            UPDATE user_counts SET total = 0 WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("CREATE TRIGGER users_count_insert AFTER INSERT ON users REFERENCING NEW TABLE AS new_rows "
+               "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()")
+    op.execute("CREATE TRIGGER users_count_delete AFTER DELETE ON users REFERENCING OLD TABLE AS old_rows "
+               "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()")
+    op.execute("CREATE TRIGGER users_count_truncate AFTER TRUNCATE ON users "
+               "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()")
+    # CREATE TRIGGER locks users against writes until commit, so the seed cannot miss a row.
+    op.execute("INSERT INTO user_counts (id, total) SELECT 1, count(*) FROM users")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS users_count_truncate ON users")
+    op.execute("DROP TRIGGER IF EXISTS users_count_delete ON users")
+    op.execute("DROP TRIGGER IF EXISTS users_count_insert ON users")
+    op.execute("DROP FUNCTION IF EXISTS user_counts_apply()")
+    op.drop_table('user_counts')
@@ -0,0 +1,26 @@
+"""add users created_at id index
+
+Revision ID: 8c1f3a6e2b70
+Revises: 5b7e2c91d4a3
+Create Date: 2026-10-18 11:02:17.540931
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f3a6e2b70'
+down_revision: Union[str, None] = '5b7e2c91d4a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_created_at_id', table_name='users')
@@ -0,0 +1,39 @@
+"""case-insensitive user emails
+
+Revision ID: a7c3e9d5b214
+Revises: f4b8d2a61c35
+Create Date: 2026-10-18 16:05:12.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9d5b214'
+down_revision: Union[str, None] = 'f4b8d2a61c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    # Accounts that differ only by email case must be merged by hand before the unique index can exist.
+    duplicates = bind.execute(sa.text(
+        "SELECT lower(email), string_agg(id::text, ', ' ORDER BY created_at) FROM users "
+        "GROUP BY lower(email) HAVING count(*) > 1"
+    )).all()
+    if duplicates:
+        listing = "\n".join(f"  {email}: {ids}" for email, ids in duplicates)
+        raise RuntimeError(f"Users whose emails differ only by case must be merged first:\n{listing}")
+    op.execute("UPDATE users SET email = lower(email) WHERE email <> lower(email)")
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+    op.drop_index('ix_users_email', table_name='users')
+
+
+def downgrade() -> None:
+    # Emails stay lowercase; only the case-sensitive index is restored.
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -0,0 +1,51 @@
+"""install user_counts triggers only for the counter strategy
+
+Revision ID: c5e1f7a3b962
+Revises: a7c3e9d5b214
+Create Date: 2026-10-18 16:02:41.530218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1f7a3b962'
+down_revision: Union[str, None] = 'a7c3e9d5b214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Every write to users paid for the counter row; the app reinstalls the triggers at startup
+    # when USER_COUNT_STRATEGY=counter (app.models.user_count_model.set_user_counter_enabled).
+    op.execute("DROP TRIGGER IF EXISTS users_count_truncate ON users")
+    op.execute("DROP TRIGGER IF EXISTS users_count_delete ON users")
+    op.execute("DROP TRIGGER IF EXISTS users_count_insert ON users")
+    op.execute("DROP FUNCTION IF EXISTS user_counts_apply()")
+    op.execute("DELETE FROM user_counts")
+
+
+def downgrade() -> None:
+    op.execute("""
+    CREATE OR REPLACE FUNCTION user_counts_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            UPDATE user_counts SET total = total + (SELECT count(*) FROM new_rows) WHERE id = 1;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE user_counts SET total = total - (SELECT count(*) FROM old_rows) WHERE id = 1;
+        ELSE
+            UPDATE user_counts SET total = 0 WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """)
+    op.execute("CREATE TRIGGER users_count_insert AFTER INSERT ON users REFERENCING NEW TABLE AS new_rows "
+               "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()")
+    op.execute("CREATE TRIGGER users_count_delete AFTER DELETE ON users REFERENCING OLD TABLE AS old_rows "
+               "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()")
+    op.execute("CREATE TRIGGER users_count_truncate AFTER TRUNCATE ON users "
+               "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()")
+    op.execute("INSERT INTO user_counts (id, total) SELECT 1, count(*) FROM users")
@@ -0,0 +1,55 @@
+"""add user directory filter and search indexes
+
+Revision ID: f4b8d2a61c35
+Revises: 3d9a7e5c1f42
+Create Date: 2026-10-18 15:20:44.118302
+
+"""
+from typing import Sequence, Union
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8d2a61c35'
+down_revision: Union[str, None] = '3d9a7e5c1f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Columns searched with ILIKE '%term%' by the user directory.
+TRIGRAM_COLUMNS = ['nickname', 'email', 'first_name', 'last_name']
+
+
+def upgrade() -> None:
+    # Built concurrently so a large users table stays writable while the indexes build.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_role_created_at_id', 'users', ['role', 'created_at', 'id'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_users_locked_created_at_id', 'users', ['created_at', 'id'], unique=False,
+                        postgresql_where=sa.text('is_locked'), postgresql_concurrently=True)
+        op.create_index('ix_users_unverified_created_at_id', 'users', ['created_at', 'id'], unique=False,
+                        postgresql_where=sa.text('NOT email_verified'), postgresql_concurrently=True)
+
+        available = op.get_bind().execute(
+            sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        ).scalar()
+        if not available:
+            logger.warning('pg_trgm is not available; user search will run without trigram indexes')
+            return
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in TRIGRAM_COLUMNS:
+            op.create_index(f'ix_users_{column}_trgm', 'users', [column], unique=False, postgresql_using='gin',
+                            postgresql_ops={column: 'gin_trgm_ops'}, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in TRIGRAM_COLUMNS:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_users_{column}_trgm')
+        op.drop_index('ix_users_unverified_created_at_id', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_locked_created_at_id', table_name='users', postgresql_concurrently=True)
+        op.drop_index('ix_users_role_created_at_id', table_name='users', postgresql_concurrently=True)
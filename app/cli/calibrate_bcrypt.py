@@ -0,0 +1,75 @@
+# calibrate_bcrypt.py
+"""
+Measures bcrypt hashing time on this host and recommends the highest cost factor that still
+fits a target latency budget.
+
+Usage:
+    python -m app.cli.calibrate_bcrypt --target-ms 250
+
+Put the printed `BCRYPT_ROUNDS=<n>` line into the deployment's environment or `.env` file.
+Existing hashes are moved to the new cost the next time each user logs in successfully.
+"""
+from builtins import float, int, len, print, range, sorted
+import argparse
+import time
+from typing import Callable, List, Optional
+from app.utils.security import hash_password
+
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+def measure_hash_seconds(rounds: int, samples: int = 3) -> float:
+    """Return the median wall time of hashing a password at the given cost factor."""
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hash_password("calibration-password", rounds)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+def calibrate_rounds(
+    target_ms: float,
+    min_rounds: int = MIN_ROUNDS,
+    max_rounds: int = MAX_ROUNDS,
+    measure: Callable[[int], float] = measure_hash_seconds,
+    report: Optional[List] = None,
+) -> int:
+    """
+    Pick the highest cost factor whose hash time stays within `target_ms`.
+
+    Each extra round doubles the work, so measuring stops at the first cost over budget.
+    `min_rounds` is returned even if it is already over budget, as a security floor.
+    """
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        elapsed_ms = measure(rounds) * 1000
+        if report is not None:
+            report.append((rounds, elapsed_ms))
+        if elapsed_ms > target_ms:
+            break
+        chosen = rounds
+    return chosen
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pick a bcrypt cost factor for this host.")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Latency budget for one hash in milliseconds")
+    parser.add_argument("--min-rounds", type=int, default=MIN_ROUNDS, help="Lowest cost factor to consider")
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS, help="Highest cost factor to consider")
+    parser.add_argument("--samples", type=int, default=3, help="Hashes measured per cost factor")
+    args = parser.parse_args(argv)
+
+    report = []
+    rounds = calibrate_rounds(
+        args.target_ms,
+        min_rounds=args.min_rounds,
+        max_rounds=args.max_rounds,
+        measure=lambda r: measure_hash_seconds(r, args.samples),
+        report=report,
+    )
+    for measured_rounds, elapsed_ms in report:
+        print(f"rounds={measured_rounds:2d}  {elapsed_ms:8.1f} ms")
+    print(f"BCRYPT_ROUNDS={rounds}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+# import_users.py
+"""
+Bulk-imports users from a CSV (with a header row) or JSON Lines file of `UserCreate` fields.
+
+Usage:
+    python -m app.cli.import_users cohort.csv [--format jsonl] [--chunk-size 500] [--send-emails]
+
+Rows are committed chunk by chunk; rejected rows are listed with their line numbers and the
+exit status is 1 if any row failed. Verification emails are only sent with `--send-emails`,
+after the whole file has been loaded.
+"""
+from builtins import int, len, open, print
+import argparse
+import asyncio
+from typing import List, Optional
+from app.database import Database
+from app.dependencies import get_email_service
+from app.services.user_import_service import IMPORT_FORMATS, UserImportService, iter_import_rows, send_verification_emails
+from settings.config import settings
+
+async def run_import(path: str, fmt: str, chunk_size: Optional[int], send_emails: bool):
+    Database.initialize(settings.database_url)
+    created = []
+    try:
+        async with Database.get_session_factory()() as session:
+            with open(path, encoding="utf-8", newline="") as lines:
+                report = await UserImportService.import_rows(
+                    session, iter_import_rows(lines, fmt), on_created=created.extend if send_emails else None,
+                    chunk_size=chunk_size,
+                )
+        if send_emails:
+            await send_verification_emails(get_email_service(), created)
+    finally:
+        await Database._engine.dispose()
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-import users from a CSV or JSON Lines file.")
+    parser.add_argument("path", help="File to import")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to jsonl for .jsonl/.ndjson files, else csv")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per INSERT batch (default: USER_IMPORT_CHUNK_SIZE)")
+    parser.add_argument("--send-emails", action="store_true", help="Send verification emails to imported users")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+    report = asyncio.run(run_import(args.path, fmt, args.chunk_size, args.send_emails))
+    for error in report.errors:
+        print(f"line {error.row}: {error.email or '-'}: {'; '.join(error.errors)}")
+    print(f"created={report.created} failed={report.failed}")
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,21 +1,155 @@
+import itertools
+import logging
+import time
+from typing import List, Optional
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.utils.metrics import Counter, Gauge
+from app.utils.sql_instrumentation import SQLInstrumentation
+from app.utils.tracing import SQLTracing
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+# Session.info key set by `get_db`: the request commits once at the end, so services only flush.
+UNIT_OF_WORK = "unit_of_work"
+
+async def commit_or_flush(session: AsyncSession):
+    """Commit, or only flush when the session belongs to a request-scoped unit of work."""
+    if session.info.get(UNIT_OF_WORK):
+        await session.flush()
+    else:
+        await session.commit()
+
+# Session.info key holding callbacks that `get_db` runs once the unit of work has committed.
+AFTER_COMMIT = "after_commit"
+
+async def after_commit(session: AsyncSession, callback):
+    """
+    Run the coroutine function `callback` once the session's changes are committed.
+
+    In a unit of work it is queued until `get_db` commits; otherwise the caller has already
+    committed through `commit_or_flush`, so it runs now. Use it for side effects such as email
+    that must not run, or hold the transaction open, before the commit.
+    """
+    if session.info.get(UNIT_OF_WORK):
+        session.info.setdefault(AFTER_COMMIT, []).append(callback)
+    else:
+        await callback()
+
+async def run_after_commit(session: AsyncSession):
+    """Run the callbacks queued by `after_commit`; the data is already committed, so failures are only logged."""
+    for callback in session.info.pop(AFTER_COMMIT, []):
+        try:
+            await callback()
+        except Exception as e:
+            logger.error(f"After-commit callback {callback!r} failed: {e}")
+
+class PoolWaitStats:
+    """Counts connection checkouts and how long they waited for a free connection."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that reports checkout wait time to `Database.pool_wait`."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            Database.pool_wait.timeouts += 1
+            raise
+        Database.pool_wait.observe(time.perf_counter() - start)
+        return connection
+
 class Database:
-    """Handles database connections and sessions."""
+    """
+    Handles database connections and sessions.
+
+    Writes go to the primary engine. Read-only sessions are handed out round-robin across the
+    optional replica engines, or from the primary when no replicas are configured; either way
+    they run in READ ONLY transactions on PostgreSQL.
+    """
     _engine = None
     _session_factory = None
+    _replica_engines: List = []
+    _read_session_factories: List = []
+    _read_factory_cycle = None
+    pool_wait = PoolWaitStats()  # shared by the primary and replica pools
+    sql_instrumentation: Optional[SQLInstrumentation] = None
+    sql_tracing: Optional[SQLTracing] = None
 
     @classmethod
-    def initialize(cls, database_url: str, echo: bool = False):
-        """Initialize the async engine and sessionmaker."""
+    def initialize(
+        cls,
+        database_url: str,
+        echo: bool = False,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        statement_cache_size: Optional[int] = None,
+        replica_urls: Optional[List[str]] = None,
+        slow_query_ms: float = 200,
+    ):
+        """Initialize the async engine and sessionmaker, with SQL instrumentation and tracing on every engine."""
         if cls._engine is None:  # Ensure engine is created once
-            cls._engine = create_async_engine(database_url, echo=echo, future=True)
+            engine_options = {}
+            if not database_url.startswith("sqlite"):  # SQLite uses a single static connection
+                engine_options.update(
+                    poolclass=TimedQueuePool,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_timeout=pool_timeout,
+                    pool_recycle=pool_recycle,
+                    pool_pre_ping=pool_pre_ping,
+                )
+            if statement_cache_size is not None and "+asyncpg" in database_url:
+                # SQLAlchemy's prepared statement cache and asyncpg's own; 0 disables both (e.g. behind pgbouncer)
+                engine_options["connect_args"] = {
+                    "prepared_statement_cache_size": statement_cache_size,
+                    "statement_cache_size": statement_cache_size,
+                }
+            cls._engine = create_async_engine(database_url, echo=echo, future=True, **engine_options)
             cls._session_factory = sessionmaker(
                 bind=cls._engine, class_=AsyncSession, expire_on_commit=False, future=True
             )
+            cls._replica_engines = [
+                create_async_engine(url, echo=echo, future=True, **engine_options) for url in replica_urls or []
+            ]
+            cls._read_session_factories = [
+                sessionmaker(bind=cls._read_only(engine), class_=AsyncSession, expire_on_commit=False, future=True)
+                for engine in cls._replica_engines or [cls._engine]
+            ]
+            cls._read_factory_cycle = itertools.cycle(cls._read_session_factories)
+            cls.sql_instrumentation = SQLInstrumentation(slow_query_ms)
+            cls.sql_tracing = SQLTracing()
+            for engine in [cls._engine, *cls._replica_engines]:
+                cls.sql_instrumentation.attach(engine.sync_engine)
+                cls.sql_tracing.attach(engine.sync_engine)
+
+    @staticmethod
+    def _read_only(engine):
+        if engine.dialect.name == "postgresql":
+            return engine.execution_options(postgresql_readonly=True)
+        return engine
 
     @classmethod
     def get_session_factory(cls):
@@ -23,3 +157,64 @@ class Database:
         if cls._session_factory is None:
             raise ValueError("Database not initialized. Call `initialize()` first.")
         return cls._session_factory
+
+    @classmethod
+    def get_read_session_factory(cls):
+        """Returns the next read-only session factory, rotating across replicas."""
+        if cls._session_factory is None:
+            raise ValueError("Database not initialized. Call `initialize()` first.")
+        return next(cls._read_factory_cycle)
+
+    @classmethod
+    def has_replicas(cls) -> bool:
+        return bool(cls._replica_engines)
+
+    @staticmethod
+    def _queue_pool_status(pool) -> dict:
+        status = {"pool": type(pool).__name__}
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            status.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        return status
+
+    @classmethod
+    def pool_status(cls) -> dict:
+        """Live connection pool statistics for the primary engine, with replicas listed separately."""
+        if cls._engine is None:
+            raise ValueError("Database not initialized. Call `initialize()` first.")
+        status = cls._queue_pool_status(cls._engine.pool)
+        status["replicas"] = [cls._queue_pool_status(engine.pool) for engine in cls._replica_engines]
+        status.update(
+            checkouts=cls.pool_wait.checkouts,
+            checkout_timeouts=cls.pool_wait.timeouts,
+            checkout_wait_seconds_total=cls.pool_wait.wait_seconds_total,
+            checkout_wait_seconds_max=cls.pool_wait.wait_seconds_max,
+        )
+        return status
+
+def _pool_samples(field: str) -> dict:
+    """`{(pool,): value}` for one `pool_status` field across the primary and replica pools."""
+    if Database._engine is None:
+        return {}
+    status = Database.pool_status()
+    pools = [("primary", status)] + [(f"replica{index}", replica) for index, replica in enumerate(status["replicas"])]
+    return {(name,): pool[field] for name, pool in pools if field in pool}
+
+for _field, _documentation in (
+    ("size", "Connections the pool keeps open."),
+    ("checked_out", "Connections currently in use."),
+    ("checked_in", "Idle connections in the pool."),
+    ("overflow", "Connections open beyond the pool size."),
+):
+    Gauge(f"db_pool_{_field}", _documentation, ["pool"], collect=lambda field=_field: _pool_samples(field))
+
+Counter("db_pool_checkouts_total", "Connection checkouts across all pools.",
+        collect=lambda: {(): Database.pool_wait.checkouts})
+Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection.",
+        collect=lambda: {(): Database.pool_wait.timeouts})
+Counter("db_pool_checkout_wait_seconds_total", "Time spent waiting for a free connection.",
+        collect=lambda: {(): Database.pool_wait.wait_seconds_total})
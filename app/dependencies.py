@@ -1,11 +1,15 @@
-from builtins import Exception, dict, str
-from fastapi import Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from builtins import Exception, ValueError, any, dict, int, reversed, str
+import ipaddress
+import math
+from fastapi import Depends, HTTPException, Request, Response
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import Database
+from app.database import UNIT_OF_WORK, Database, run_after_commit
 from app.utils.template_manager import TemplateManager
 from app.services.email_service import EmailService
-from app.services.jwt_service import decode_token
+from app.services.jwt_service import decode_token_cached
+from app.utils.rate_limiter import InMemoryRateLimitStore, SlidingWindowRateLimiter, SQLiteRateLimitStore
 from app.utils.smtp_connection import SMTPClient
 from settings.config import Settings
 
@@ -25,23 +29,60 @@ def get_email_service() -> EmailService:
     return EmailService(smtp_client=smtp_client, template_manager=template_manager)
 
 async def get_db() -> AsyncSession:
-    """Dependency that provides a database session for each request."""
+    """
+    Dependency that provides a database session for each request.
+
+    The session is one unit of work: services flush instead of committing, and the transaction
+    commits once after the endpoint returns, or rolls back if it raised. Callbacks registered
+    with `after_commit` run only after a successful commit.
+    """
     async_session_factory = Database.get_session_factory()
     async with async_session_factory() as session:
+        session.info[UNIT_OF_WORK] = True
         try:
             yield session
-        except Exception as e:
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
             raise HTTPException(status_code=500, detail=str(e))
+        except Exception:
+            await session.rollback()
+            raise
+        await run_after_commit(session)
+
+# Set after a write so the same client's follow-up reads see it before replicas catch up.
+READ_YOUR_WRITES_COOKIE = "read_primary"
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """Dependency that provides a read-only session, from a replica when one is configured."""
+    if request.cookies.get(READ_YOUR_WRITES_COOKIE):
+        async_session_factory = Database.get_session_factory()
+    else:
+        async_session_factory = Database.get_read_session_factory()
+    async with async_session_factory() as session:
+        try:
+            yield session
+        except SQLAlchemyError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+def mark_recent_write(response: Response):
+    """Pin the client's reads to the primary for `replica_read_your_writes_seconds` after a write."""
+    if Database.has_replicas():
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, "1",
+            max_age=get_settings().replica_read_your_writes_seconds, httponly=True, samesite="lax",
+        )
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_token(token)
+    # Cached verification; async so it runs on the loop instead of a threadpool hop per request.
+    payload = decode_token_cached(token)
     if payload is None:
         raise credentials_exception
     user_id: str = payload.get("sub")
@@ -51,8 +92,74 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     return {"user_id": user_id, "role": user_role}
 
 def require_role(role: str):
-    def role_checker(current_user: dict = Depends(get_current_user)):
+    async def role_checker(current_user: dict = Depends(get_current_user)):
         if current_user["role"] not in role:
             raise HTTPException(status_code=403, detail="Operation not permitted")
         return current_user
     return role_checker
+
+_login_rate_limiter = None
+
+def get_login_rate_limiter() -> SlidingWindowRateLimiter:
+    """Return the process-wide login throttle, built from settings on first use."""
+    global _login_rate_limiter
+    if _login_rate_limiter is None:
+        settings = get_settings()
+        if settings.login_rate_limit_backend == "sqlite":
+            store = SQLiteRateLimitStore(settings.login_rate_limit_sqlite_path)
+        else:
+            store = InMemoryRateLimitStore(max_keys=settings.login_rate_limit_max_keys)
+        _login_rate_limiter = SlidingWindowRateLimiter(store, settings.login_rate_limit_window_seconds)
+    return _login_rate_limiter
+
+def _is_trusted_proxy(address: str, trusted_proxies) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies)
+
+def get_client_ip(request: Request) -> str:
+    """
+    Return the address of the client behind any trusted proxies.
+
+    X-Forwarded-For is only believed when the peer is in `settings.trusted_proxies`; it is read
+    right to left, skipping trusted hops, so a client cannot spoof its address by sending the
+    header itself.
+    """
+    trusted_proxies = get_settings().trusted_proxies
+    client_ip = request.client.host if request.client else "unknown"
+    if not trusted_proxies or not _is_trusted_proxy(client_ip, trusted_proxies):
+        return client_ip
+    forwarded = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        client_ip = hop
+        if not _is_trusted_proxy(hop, trusted_proxies):
+            break
+    return client_ip
+
+def _username_key(username: str) -> str:
+    return f"user:{username.strip().lower()}"
+
+def throttle_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    """
+    Reject login attempts over the per-IP or per-username limit before they reach the database.
+
+    A successful login clears its username's count through `reset_login_throttle`, so only
+    failed attempts use up the per-username budget.
+    """
+    settings = get_settings()
+    limiter = get_login_rate_limiter()
+    client_ip = get_client_ip(request)
+    retry_after = limiter.hit(f"ip:{client_ip}", settings.login_rate_limit_per_ip) or \
+        limiter.hit(_username_key(form_data.username), settings.login_rate_limit_per_username)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many login attempts. Try again later.",
+            headers={"Retry-After": str(int(math.ceil(retry_after)))},
+        )
+
+def reset_login_throttle(username: str):
+    """Clear the per-username login count after a successful login."""
+    get_login_rate_limiter().reset(_username_key(username))
@@ -5,10 +5,26 @@ from fastapi import FastAPI
 from starlette.responses import JSONResponse
 from app.database import Database
 from app.dependencies import get_settings
-from app.routers import user_routes
+from app.models.user_count_model import set_user_counter_enabled
+from app.routers import metrics_routes, user_routes
+from app.services.user_service import DuplicateUserError
 from app.utils.api_description import getDescription
+from app.utils.security import PasswordHasherBusy, shutdown_password_hasher
+from app.utils.loop_monitor import LoopLagMonitor
+from app.utils.metrics import MetricsMiddleware
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.sql_instrumentation import SQLStatsMiddleware
+from app.utils.tracing import TraceContextFilter, TracingMiddleware, build_exporters, tracer
 
-logging.basicConfig(level=logging.DEBUG)
+settings = get_settings()
+
+# Per-request SQL figures come from SQLStatsMiddleware; full query echo stays behind `debug`.
+_log_handler = logging.StreamHandler()
+_log_handler.addFilter(TraceContextFilter())
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [trace=%(trace_id)s] %(message)s"))
+logging.basicConfig(level=logging.DEBUG if settings.debug else logging.INFO, handlers=[_log_handler])
+
+tracer.exporters = build_exporters(settings)
 
 app = FastAPI(
     title="User Management",
@@ -22,15 +38,58 @@ app = FastAPI(
     license_info={"name": "MIT", "url": "https://opensource.org/licenses/MIT"},
 )
 
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware, output_dir=settings.profiling_output_dir, sample_every=settings.profiling_sample_every
+    )
+app.add_middleware(
+    SQLStatsMiddleware, headers=settings.sql_stats_headers, repeat_threshold=settings.sql_repeat_threshold
+)
+app.add_middleware(TracingMiddleware)  # outside SQLStatsMiddleware so its request log lines carry the trace ID
+app.add_middleware(MetricsMiddleware)  # outermost, so its timings include the SQL stats reporting
+
+loop_monitor = LoopLagMonitor(
+    interval=settings.loop_lag_interval_ms / 1000, threshold=settings.loop_lag_threshold_ms / 1000
+)
+
 @app.on_event("startup")
 async def startup_event():
-    settings = get_settings()
-    Database.initialize(settings.database_url, settings.debug)
+    Database.initialize(
+        settings.database_url,
+        settings.debug,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        statement_cache_size=settings.db_statement_cache_size,
+        replica_urls=settings.database_replica_urls,
+        slow_query_ms=settings.sql_slow_query_ms,
+    )
+    # The user_counts triggers cost every registration a row lock; only keep them when they are read.
+    async with Database._engine.begin() as conn:
+        await conn.run_sync(set_user_counter_enabled, settings.user_count_strategy == "counter")
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await loop_monitor.stop()
+    shutdown_password_hasher()
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request, exc):
+    return JSONResponse(status_code=503, content={"message": "Server is busy, please retry shortly."}, headers={"Retry-After": "1"})
+
+@app.exception_handler(DuplicateUserError)
+async def duplicate_user_handler(request, exc):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 @app.exception_handler(Exception)
 async def exception_handler(request, exc):
     return JSONResponse(status_code=500, content={"message": "An unexpected error occurred."})
 
 app.include_router(user_routes.router)
+app.include_router(metrics_routes.router)
 
 
@@ -0,0 +1,31 @@
+# refresh_token_model.py
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, String, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class RefreshToken(Base):
+    """
+    A refresh token issued at login, stored only as a SHA-256 digest of the opaque value handed to the client.
+
+    Attributes:
+        id (UUID): Unique identifier for the token record.
+        user_id (UUID): The user the token was issued to; tokens are deleted with the user.
+        token_hash (str): Hex SHA-256 digest of the token.
+        expires_at (datetime): When the token stops being accepted.
+        created_at (datetime): Timestamp when the token was issued, set by the server.
+        revoked_at (datetime): When the token was rotated or revoked; NULL while usable.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash: Mapped[str] = Column(String(64), unique=True, nullable=False, index=True)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now())
+    revoked_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<RefreshToken user={self.user_id}, revoked={self.revoked_at is not None}>"
@@ -0,0 +1,96 @@
+# user_count_model.py
+from builtins import bool, len, list
+from sqlalchemy import BigInteger, Column, Connection, DDL, Integer, event, text
+from sqlalchemy.orm import Mapped
+from app.database import Base
+from app.models.user_model import User
+
+class UserCount(Base):
+    """
+    Single-row running total of the users table, kept current by statement-level triggers.
+
+    Reading it is one primary-key lookup instead of a count(*) scan. While the triggers are
+    installed, every insert or delete on `users` also updates this row, so concurrent writers
+    serialize on it until they commit. The triggers are therefore only installed, by
+    `set_user_counter_enabled` at startup, when `user_count_strategy` is "counter"; otherwise
+    the row is absent.
+
+    Attributes:
+        id (int): Always 1.
+        total (int): Number of rows in `users`.
+    """
+    __tablename__ = "user_counts"
+
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    total: Mapped[int] = Column(BigInteger, nullable=False)
+
+# Created after (and dropped before) users, since the triggers live on that table.
+UserCount.__table__.add_is_dependent_on(User.__table__)
+
+COUNTER_TRIGGERS = ("users_count_insert", "users_count_delete", "users_count_truncate")
+
+COUNTER_TRIGGER_DDL = [
+    # Inserts that hit ON CONFLICT DO NOTHING still fire the trigger, with no rows; skip those.
+    """
+    CREATE OR REPLACE FUNCTION user_counts_apply() RETURNS trigger AS $$
+    DECLARE
+        delta bigint;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            SELECT count(*) INTO delta FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT -count(*) INTO delta FROM old_rows;
+        ELSE
+            UPDATE user_counts SET total = 0 WHERE id = 1;
+            RETURN NULL;
+        END IF;
+        IF delta <> 0 THEN
+            UPDATE user_counts SET total = total + delta WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "CREATE OR REPLACE TRIGGER users_count_insert AFTER INSERT ON users REFERENCING NEW TABLE AS new_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()",
+    "CREATE OR REPLACE TRIGGER users_count_delete AFTER DELETE ON users REFERENCING OLD TABLE AS old_rows "
+    "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()",
+    "CREATE OR REPLACE TRIGGER users_count_truncate AFTER TRUNCATE ON users "
+    "FOR EACH STATEMENT EXECUTE FUNCTION user_counts_apply()",
+    # CREATE TRIGGER locks users against writes until commit, so the seed cannot miss a row.
+    "INSERT INTO user_counts (id, total) SELECT 1, count(*) FROM users "
+    "ON CONFLICT (id) DO UPDATE SET total = EXCLUDED.total",
+]
+
+COUNTER_TRIGGER_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS users_count_insert ON users",
+    "DROP TRIGGER IF EXISTS users_count_delete ON users",
+    "DROP TRIGGER IF EXISTS users_count_truncate ON users",
+    "DROP FUNCTION IF EXISTS user_counts_apply()",
+]
+
+def set_user_counter_enabled(connection: Connection, enabled: bool) -> bool:
+    """
+    Install or remove the counter triggers to match `enabled`; returns True if anything changed.
+
+    Takes a sync connection (use `run_sync` from async code) and only issues DDL when the
+    installed triggers differ from what is wanted, so it is cheap to call on every startup.
+    """
+    if connection.execute(text("SELECT to_regclass('user_counts')")).scalar() is None:
+        return False  # migrations have not run yet
+    installed = connection.execute(
+        text("SELECT count(*) FROM pg_trigger WHERE tgrelid = 'users'::regclass AND tgname = ANY(:names)"),
+        {"names": list(COUNTER_TRIGGERS)},
+    ).scalar()
+    if enabled and installed < len(COUNTER_TRIGGERS):
+        statements = COUNTER_TRIGGER_DDL
+    elif not enabled and installed:
+        statements = COUNTER_TRIGGER_DROP_DDL + ["DELETE FROM user_counts"]
+    else:
+        return False
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    return True
+
+for statement in COUNTER_TRIGGER_DROP_DDL:
+    event.listen(UserCount.__table__, "before_drop", DDL(statement).execute_if(dialect="postgresql"))
@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum
 import uuid
 from sqlalchemy import (
-    Column, String, Integer, DateTime, Boolean, func, Enum as SQLAlchemyEnum
+    Column, String, Integer, DateTime, Boolean, Index, func, text, Enum as SQLAlchemyEnum
 )
 from sqlalchemy.dialects.postgresql import UUID, ENUM
 from sqlalchemy.orm import Mapped, mapped_column
@@ -53,10 +53,20 @@ class User(Base):
     """
     __tablename__ = "users"
     __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),  # keyset pagination order
+        # Email identity is case-insensitive; lookups compare lower(email) so they use this index.
+        Index("ix_users_email_lower", text("lower(email)"), unique=True),
+        # Directory filters, each kept in listing order. The pg_trgm indexes behind the text
+        # search are created by migration f4b8d2a61c35 only, as the extension may be unavailable.
+        Index("ix_users_role_created_at_id", "role", "created_at", "id"),
+        Index("ix_users_locked_created_at_id", "created_at", "id", postgresql_where=text("is_locked")),
+        Index("ix_users_unverified_created_at_id", "created_at", "id", postgresql_where=text("NOT email_verified")),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     nickname: Mapped[str] = Column(String(50), unique=True, nullable=False, index=True)
-    email: Mapped[str] = Column(String(255), unique=True, nullable=False, index=True)
+    email: Mapped[str] = Column(String(255), nullable=False)  # stored lowercase; unique via ix_users_email_lower
     first_name: Mapped[str] = Column(String(100), nullable=True)
     last_name: Mapped[str] = Column(String(100), nullable=True)
     bio: Mapped[str] = Column(String(500), nullable=True)
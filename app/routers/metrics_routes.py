@@ -0,0 +1,14 @@
+"""
+Prometheus scrape endpoint.
+
+`/metrics` is unauthenticated, as scrapers expect; keep it off the public internet with the
+reverse proxy (e.g. an nginx `location /metrics { allow 10.0.0.0/8; deny all; }` block).
+"""
+from fastapi import APIRouter, Response
+from app.utils.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+@router.get("/metrics", name="metrics", include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
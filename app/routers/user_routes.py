@@ -19,26 +19,33 @@ Key Highlights:
 - Utilizes OAuth2PasswordBearer for securing API endpoints, requiring valid access tokens for operations.
 """
 
-from builtins import dict, int, len, str
+from builtins import UnicodeDecodeError, ValueError, dict, int, len, str
+import codecs
 from datetime import timedelta
+from typing import Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Response, status, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Response, UploadFile, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.dependencies import get_current_user, get_db, get_email_service, require_role
+from app.database import Database
+from app.dependencies import get_current_user, get_db, get_email_service, get_read_db, mark_recent_write, require_role, reset_login_throttle, throttle_login
 from app.schemas.pagination_schema import EnhancedPagination
-from app.schemas.token_schema import TokenResponse
-from app.schemas.user_schemas import LoginRequest, UserBase, UserCreate, UserListResponse, UserResponse, UserUpdate
-from app.services.user_service import UserService
+from app.schemas.token_schema import RefreshTokenRequest, TokenResponse
+from app.schemas.user_schemas import LoginRequest, UserBase, UserBatchGetItem, UserBatchGetRequest, UserBatchGetResponse, UserCreate, UserFilter, UserImportReport, UserListResponse, UserResponse, UserUpdate
+from app.services.user_export_service import EXPORT_FORMATS, UserExportService
+from app.services.user_import_service import UserImportService, iter_import_rows, send_verification_emails
+from app.services.user_service import USER_RESPONSE_COLUMNS, UserService
 from app.services.jwt_service import create_access_token
-from app.utils.link_generation import create_user_links, generate_pagination_links
+from app.services.refresh_token_service import RefreshTokenService
+from app.utils.link_generation import create_user_links, generate_cursor_pagination_links, generate_pagination_links
 from app.dependencies import get_settings
 from app.services.email_service import EmailService
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 settings = get_settings()
 @router.get("/users/{user_id}", response_model=UserResponse, name="get_user", tags=["User Management Requires (Admin or Manager Roles)"])
-async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(get_read_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
     Endpoint to fetch a user by their unique identifier (UUID).
 
@@ -48,29 +55,33 @@ async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(g
     Args:
         user_id: UUID of the user to fetch.
         request: The request object, used to generate full URLs in the response.
-        db: Dependency that provides an AsyncSession for database access.
+        db: Dependency that provides a read-only AsyncSession, served by a replica when configured.
         token: The OAuth2 access token obtained through OAuth2PasswordBearer dependency.
     """
-    user = await UserService.get_by_id(db, user_id)
+    user = await UserService.get_user_row(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    return UserResponse.model_construct(
-        id=user.id,
-        nickname=user.nickname,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        bio=user.bio,
-        profile_picture_url=user.profile_picture_url,
-        github_profile_url=user.github_profile_url,
-        linkedin_profile_url=user.linkedin_profile_url,
-        role=user.role,
-        email=user.email,
-        last_login_at=user.last_login_at,
-        created_at=user.created_at,
-        updated_at=user.updated_at,
-        links=create_user_links(user.id, request)  
-    )
+    return UserResponse.model_construct(**user._mapping, links=create_user_links(user.id, request))
+
+@router.post("/users/batch-get/", response_model=UserBatchGetResponse, name="batch_get_users", tags=["User Management Requires (Admin or Manager Roles)"])
+async def batch_get_users(body: UserBatchGetRequest, db: AsyncSession = Depends(get_read_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+    """
+    Fetch up to `user_batch_get_max_ids` users in one request and one query.
+
+    Items come back in request order; IDs with no user are marked `found: false` and listed in `missing`.
+    """
+    if len(body.ids) > settings.user_batch_get_max_ids:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.user_batch_get_max_ids} IDs per request",
+        )
+    rows = await UserService.get_user_rows_by_ids(db, body.ids)
+    items = [
+        UserBatchGetItem(id=user_id, found=user_id in rows, user=UserResponse.model_construct(**rows[user_id]._mapping) if user_id in rows else None)
+        for user_id in body.ids
+    ]
+    return UserBatchGetResponse(items=items, missing=[item.id for item in items if not item.found])
 
 # Additional endpoints for update, delete, create, and list users follow a similar pattern, using
 # asynchronous database operations, handling security with OAuth2PasswordBearer, and enhancing response
@@ -80,7 +91,7 @@ async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(g
 # experience by adhering to REST principles and providing self-discoverable operations.
 
 @router.put("/users/{user_id}", response_model=UserResponse, name="update_user", tags=["User Management Requires (Admin or Manager Roles)"])
-async def update_user(user_id: UUID, user_update: UserUpdate, request: Request, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+async def update_user(user_id: UUID, user_update: UserUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
     Update user information.
 
@@ -91,6 +102,7 @@ async def update_user(user_id: UUID, user_update: UserUpdate, request: Request,
     updated_user = await UserService.update(db, user_id, user_data)
     if not updated_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    mark_recent_write(response)
 
     return UserResponse.model_construct(
         id=updated_user.id,
@@ -119,17 +131,19 @@ async def delete_user(user_id: UUID, db: AsyncSession = Depends(get_db), token:
     success = await UserService.delete(db, user_id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    mark_recent_write(response)
+    return response
 
 
 
 @router.post("/users/", response_model=UserResponse, status_code=status.HTTP_201_CREATED, tags=["User Management Requires (Admin or Manager Roles)"], name="create_user")
-async def create_user(user: UserCreate, request: Request, db: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+async def create_user(user: UserCreate, request: Request, response: Response, db: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
     Create a new user.
 
     This endpoint creates a new user with the provided information. If the email
-    already exists, it returns a 400 error. On successful creation, it returns the
+    or nickname already exists, it returns a 400 error. On successful creation, it returns the
     newly created user's information along with links to related actions.
 
     Parameters:
@@ -140,14 +154,10 @@ async def create_user(user: UserCreate, request: Request, db: AsyncSession = Dep
     Returns:
     - UserResponse: The newly created user's information along with navigation links.
     """
-    existing_user = await UserService.get_by_email(db, user.email)
-    if existing_user:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
-    
     created_user = await UserService.create(db, user.model_dump(), email_service)
     if not created_user:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create user")
-    
+    mark_recent_write(response)
     
     return UserResponse.model_construct(
         id=created_user.id,
@@ -164,27 +174,101 @@ async def create_user(user: UserCreate, request: Request, db: AsyncSession = Dep
     )
 
 
+@router.post("/users/import/", response_model=UserImportReport, name="import_users", tags=["User Management Requires (Admin or Manager Roles)"])
+async def import_users(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    file: UploadFile = File(..., description="CSV with a header row, or JSON Lines, of UserCreate fields"),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$", description="Defaults to jsonl for .jsonl/.ndjson files, else csv"),
+    db: AsyncSession = Depends(get_db),
+    email_service: EmailService = Depends(get_email_service),
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))
+):
+    """
+    Bulk-create users from an uploaded file, streamed and committed in chunks.
+
+    Verification emails are queued to run after the response is sent. The response reports how
+    many users were created and, per failed line, why it was rejected; a file that stops being
+    valid UTF-8 keeps the rows before that point and reports the line where it stopped.
+    """
+    fmt = format or ("jsonl" if (file.filename or "").endswith((".jsonl", ".ndjson")) else "csv")
+    rows = iter_import_rows(codecs.iterdecode(file.file, "utf-8"), fmt)
+    report = await UserImportService.import_rows(
+        db, rows, on_created=lambda users: background_tasks.add_task(send_verification_emails, email_service, users)
+    )
+    if report.created:
+        mark_recent_write(response)
+    return report
+
+
+@router.get("/users/export/", name="export_users", tags=["User Management Requires (Admin or Manager Roles)"])
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(require_role(["ADMIN"]))
+):
+    """
+    Stream every user as NDJSON or CSV, starting with the first batch read from the database.
+
+    The session is opened inside the response body rather than taken from `get_read_db`,
+    because dependency sessions close before a streaming response starts sending.
+    """
+    async def body():
+        async with Database.get_read_session_factory()() as session:
+            async for chunk in UserExportService.stream(session, format):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+
 @router.get("/users/", response_model=UserListResponse, tags=["User Management Requires (Admin or Manager Roles)"])
 async def list_users(
     request: Request,
     skip: int = 0,
     limit: int = 10,
-    db: AsyncSession = Depends(get_db),
+    pagination: str = Query("offset", pattern="^(offset|cursor)$", description="`cursor` pages by keyset instead of skip"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next/prev link"),
+    filters: UserFilter = Depends(),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))
 ):
-    total_users = await UserService.count(db)
-    users = await UserService.list_users(db, skip, limit)
+    total_users, total_is_exact = await UserService.total_count(db, filters=filters)
+    # Carried over to the pagination links so every page keeps the same filters.
+    filter_params = filters.model_dump(mode="json", exclude_none=True)
+    if cursor or pagination == "cursor":
+        try:
+            users, next_cursor, prev_cursor = await UserService.list_users_keyset(
+                db, limit, cursor, columns=USER_RESPONSE_COLUMNS, filters=filters
+            )
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+        return UserListResponse(
+            items=[UserResponse.model_construct(**user._mapping) for user in users],
+            total=total_users,
+            total_is_exact=total_is_exact,
+            size=len(users),
+            links=generate_cursor_pagination_links(request, limit, cursor, next_cursor, prev_cursor, filter_params),
+        )
+
+    # Projected rows from the database are already well-formed, so they are constructed unvalidated.
+    users = await UserService.list_user_rows(db, skip, limit, filters)
 
     user_responses = [
-        UserResponse.model_validate(user) for user in users
+        UserResponse.model_construct(**user._mapping) for user in users
     ]
     
-    pagination_links = generate_pagination_links(request, skip, limit, total_users)
+    pagination_links = generate_pagination_links(request, skip, limit, total_users, filter_params)
     
     # Construct the final response with pagination details
     return UserListResponse(
         items=user_responses,
         total=total_users,
+        total_is_exact=total_is_exact,
         page=skip // limit + 1,
         size=len(user_responses),
         links=pagination_links  # Ensure you have appropriate logic to create these links
@@ -192,46 +276,64 @@ async def list_users(
 
 
 @router.post("/register/", response_model=UserResponse, tags=["Login and Registration"])
-async def register(user_data: UserCreate, session: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service)):
+async def register(user_data: UserCreate, response: Response, session: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service)):
     user = await UserService.register_user(session, user_data.model_dump(), email_service)
     if user:
+        mark_recent_write(response)
         return user
-    raise HTTPException(status_code=400, detail="Email already exists")
+    raise HTTPException(status_code=400, detail="Invalid user data")
+
+def _token_response(user, refresh_token: str) -> dict:
+    access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+    access_token = create_access_token(
+        data={"sub": user.email, "role": str(user.role.name)},
+        expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
 
-@router.post("/login/", response_model=TokenResponse, tags=["Login and Registration"])
+@router.post("/login/", response_model=TokenResponse, tags=["Login and Registration"], dependencies=[Depends(throttle_login)])
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
-    if await UserService.is_account_locked(session, form_data.username):
+    user, locked = await UserService.authenticate(session, form_data.username, form_data.password)
+    if locked:
         raise HTTPException(status_code=400, detail="Account locked due to too many failed login attempts.")
-
-    user = await UserService.login_user(session, form_data.username, form_data.password)
     if user:
-        access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-
-        access_token = create_access_token(
-            data={"sub": user.email, "role": str(user.role.name)},
-            expires_delta=access_token_expires
-        )
-
-        return {"access_token": access_token, "token_type": "bearer"}
+        reset_login_throttle(form_data.username)
+        refresh_token = await RefreshTokenService.issue(session, user.id)
+        return _token_response(user, refresh_token)
     raise HTTPException(status_code=401, detail="Incorrect email or password.")
 
-@router.post("/login/", include_in_schema=False, response_model=TokenResponse, tags=["Login and Registration"])
+@router.post("/login/", include_in_schema=False, response_model=TokenResponse, tags=["Login and Registration"], dependencies=[Depends(throttle_login)])
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
-    if await UserService.is_account_locked(session, form_data.username):
+    user, locked = await UserService.authenticate(session, form_data.username, form_data.password)
+    if locked:
         raise HTTPException(status_code=400, detail="Account locked due to too many failed login attempts.")
-
-    user = await UserService.login_user(session, form_data.username, form_data.password)
     if user:
-        access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-
-        access_token = create_access_token(
-            data={"sub": user.email, "role": str(user.role.name)},
-            expires_delta=access_token_expires
-        )
-
-        return {"access_token": access_token, "token_type": "bearer"}
+        reset_login_throttle(form_data.username)
+        refresh_token = await RefreshTokenService.issue(session, user.id)
+        return _token_response(user, refresh_token)
     raise HTTPException(status_code=401, detail="Incorrect email or password.")
 
+@router.post("/token/refresh/", response_model=TokenResponse, name="refresh_token", tags=["Login and Registration"])
+async def refresh_access_token(body: RefreshTokenRequest, session: AsyncSession = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token without re-entering the password.
+
+    The presented refresh token is revoked and a new one is returned; reusing an already
+    exchanged token revokes all of the user's refresh tokens.
+    """
+    rotated = await RefreshTokenService.rotate(session, body.refresh_token)
+    if not rotated:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token.")
+    user, refresh_token = rotated
+    return _token_response(user, refresh_token)
+
+@router.post("/token/revoke/", status_code=status.HTTP_204_NO_CONTENT, name="revoke_token", tags=["Login and Registration"])
+async def revoke_refresh_token(body: RefreshTokenRequest, session: AsyncSession = Depends(get_db)):
+    """
+    Revoke a refresh token, e.g. on logout. Unknown or already revoked tokens are accepted silently.
+    """
+    await RefreshTokenService.revoke(session, body.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.get("/verify-email/{user_id}/{token}", status_code=status.HTTP_200_OK, name="verify_email", tags=["Login and Registration"])
 async def verify_email(user_id: UUID, token: str, db: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service)):
@@ -7,6 +7,7 @@ from enum import Enum
 import uuid
 import re
 
+from app.schemas.pagination_schema import PaginationLink
 from app.utils.nickname_gen import generate_nickname
 
 class UserRole(str, Enum):
@@ -23,6 +24,10 @@ def validate_url(url: Optional[str]) -> Optional[str]:
         raise ValueError('Invalid URL format')
     return url
 
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Emails are identities regardless of case, so they are stored and compared lowercase."""
+    return email.lower() if email is not None else email
+
 class UserBase(BaseModel):
     email: EmailStr = Field(..., example="john.doe@example.com")
     nickname: Optional[str] = Field(None, min_length=3, pattern=r'^[\w-]+$', example=generate_nickname())
@@ -34,6 +39,7 @@ class UserBase(BaseModel):
     github_profile_url: Optional[str] = Field(None, example="https://github.com/johndoe")
 
     _validate_urls = validator('profile_picture_url', 'linkedin_profile_url', 'github_profile_url', pre=True, allow_reuse=True)(validate_url)
+    _normalize_email = validator('email', allow_reuse=True)(normalize_email)
  
     class Config:
         from_attributes = True
@@ -74,6 +80,19 @@ class ErrorResponse(BaseModel):
     error: str = Field(..., example="Not Found")
     details: Optional[str] = Field(None, example="The requested resource was not found.")
 
+class UserFilter(BaseModel):
+    """Directory filters for `GET /users/`; unset fields do not filter."""
+    role: Optional[UserRole] = Field(None, example="MANAGER")
+    email_verified: Optional[bool] = Field(None, example=True)
+    is_locked: Optional[bool] = Field(None, example=False)
+    is_professional: Optional[bool] = Field(None, example=True)
+    created_after: Optional[datetime] = Field(None, description="Only users created at or after this time")
+    created_before: Optional[datetime] = Field(None, description="Only users created before this time")
+    search: Optional[str] = Field(
+        None, min_length=1, max_length=100, example="doe",
+        description="Case-insensitive substring of nickname, email, first or last name",
+    )
+
 class UserListResponse(BaseModel):
     items: List[UserResponse] = Field(..., example=[{
         "id": uuid.uuid4(), "nickname": generate_nickname(), "email": "john.doe@example.com",
@@ -84,5 +103,29 @@ class UserListResponse(BaseModel):
         "github_profile_url": "https://github.com/johndoe"
     }])
     total: int = Field(..., example=100)
-    page: int = Field(..., example=1)
+    total_is_exact: bool = Field(True, description="False when `total` is an estimate or a recently cached count")
+    page: Optional[int] = Field(None, example=1, description="Page number; omitted for cursor pagination")
     size: int = Field(..., example=10)
+    links: List[PaginationLink] = []
+
+class UserBatchGetRequest(BaseModel):
+    ids: List[uuid.UUID] = Field(..., min_length=1, example=[uuid.uuid4()])
+
+class UserBatchGetItem(BaseModel):
+    id: uuid.UUID = Field(..., example=uuid.uuid4())
+    found: bool = Field(..., example=True)
+    user: Optional[UserResponse] = None
+
+class UserBatchGetResponse(BaseModel):
+    items: List[UserBatchGetItem] = Field(..., description="One entry per requested ID, in request order")
+    missing: List[uuid.UUID] = Field(..., description="Requested IDs with no matching user")
+
+class UserImportRowError(BaseModel):
+    row: int = Field(..., example=3, description="Line number in the uploaded file")
+    email: Optional[str] = Field(None, example="john.doe@example.com")
+    errors: List[str] = Field(..., example=["Email already exists"])
+
+class UserImportReport(BaseModel):
+    created: int = Field(..., example=998)
+    failed: int = Field(..., example=2)
+    errors: List[UserImportRowError] = []
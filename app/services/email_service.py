@@ -1,9 +1,15 @@
-from builtins import ValueError, dict, str
+from builtins import Exception, ValueError, dict, str
+import asyncio
 from settings.config import settings
+from app.utils.metrics import Counter
+from app.utils.tracing import tracer
 from app.utils.smtp_connection import SMTPClient
 from app.utils.template_manager import TemplateManager
 from app.models.user_model import User
 
+emails_sent = Counter("emails_sent_total", "Emails handed to the SMTP server, by type.", ["email_type"])
+email_send_failures = Counter("email_send_failures_total", "Emails that failed to send, by type.", ["email_type"])
+
 class EmailService:
     def __init__(self, smtp_client: SMTPClient, template_manager: TemplateManager):
         self.smtp_client = smtp_client
@@ -19,8 +25,16 @@ class EmailService:
         if email_type not in subject_map:
             raise ValueError("Invalid email type")
 
-        html_content = self.template_manager.render_template(email_type, **user_data)
-        self.smtp_client.send_email(subject_map[email_type], html_content, user_data['email'])
+        with tracer.span("EmailService.send_user_email", "email", email_type=email_type):
+            html_content = self.template_manager.render_template(email_type, **user_data)
+            try:
+                with tracer.span("SMTP send", "smtp"):
+                    # smtplib blocks for the whole SMTP conversation; keep it off the event loop.
+                    await asyncio.to_thread(self.smtp_client.send_email, subject_map[email_type], html_content, user_data['email'])
+            except Exception:
+                email_send_failures.inc(email_type=email_type)
+                raise
+            emails_sent.inc(email_type=email_type)
 
     async def send_verification_email(self, user: User):
         verification_url = f"{settings.server_base_url}verify-email/{user.id}/{user.verification_token}"
@@ -1,7 +1,13 @@
 # app/services/jwt_service.py
-from builtins import dict, str
+from builtins import dict, float, int, isinstance, len, str
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
 import jwt
 from datetime import datetime, timedelta
+from app.utils.metrics import Counter, Gauge
 from settings.config import settings
 
 def create_access_token(*, data: dict, expires_delta: timedelta = None):
@@ -20,3 +26,83 @@ def decode_token(token: str):
         return decoded
     except jwt.PyJWTError:
         return None
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified token claims, keyed by the SHA-256 digest of the token.
+
+    Entries are dropped once the token's `exp` passes, so a cached token is never accepted
+    after it would have failed verification. Only successfully verified tokens are stored.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()  # sync endpoints and dependencies run in the threadpool
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[0])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: dict):
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(claims), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+token_cache = VerifiedTokenCache(settings.jwt_cache_size)
+
+Counter("jwt_cache_hits_total", "Access tokens served from the verified-token cache.",
+        collect=lambda: {(): token_cache.stats()["hits"]})
+Counter("jwt_cache_misses_total", "Access tokens that had to be verified.",
+        collect=lambda: {(): token_cache.stats()["misses"]})
+Counter("jwt_cache_evictions_total", "Verified tokens evicted to stay within the cache size.",
+        collect=lambda: {(): token_cache.stats()["evictions"]})
+Gauge("jwt_cache_size", "Verified tokens currently cached.", collect=lambda: {(): token_cache.stats()["size"]})
+Gauge("jwt_cache_max_size", "Capacity of the verified-token cache.", collect=lambda: {(): token_cache.stats()["max_size"]})
+
+def decode_token_cached(token: str) -> Optional[dict]:
+    """Decode a token, reusing the verified claims if the same token was seen before it expired."""
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = decode_token(token)
+        if claims is not None:
+            token_cache.put(token, claims)
+    return claims
@@ -0,0 +1,106 @@
+# refresh_token_service.py
+from builtins import bool, classmethod, int, str
+from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import secrets
+from typing import Optional, Tuple
+from uuid import UUID
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import commit_or_flush
+from app.models.refresh_token_model import RefreshToken
+from app.models.user_model import User
+from settings.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RefreshTokenService:
+    """
+    Issues, rotates and revokes refresh tokens.
+
+    Clients trade a refresh token for a new access token without sending their password, so
+    long sessions do not repeat the bcrypt work of a full login. Every exchange revokes the
+    presented token and issues a new one; presenting an already-rotated token is treated as
+    theft and revokes every token of that user.
+    """
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @classmethod
+    async def issue(cls, session: AsyncSession, user_id: UUID, commit: bool = True) -> str:
+        token = secrets.token_urlsafe(32)
+        session.add(RefreshToken(
+            user_id=user_id,
+            token_hash=cls._digest(token),
+            expires_at=datetime.now(timezone.utc) + timedelta(minutes=settings.refresh_token_expire_minutes),
+        ))
+        if commit:
+            await commit_or_flush(session)
+        return token
+
+    @classmethod
+    async def rotate(cls, session: AsyncSession, token: str) -> Optional[Tuple[User, str]]:
+        """Revoke `token` and return its user with a replacement token, or None if it cannot be used."""
+        token_hash = cls._digest(token)
+        # Claiming the token in one UPDATE makes concurrent reuse of the same token impossible.
+        query = (
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > func.now(),
+            )
+            .values(revoked_at=func.now())
+            .returning(RefreshToken.user_id)
+        )
+        user_id = (await session.execute(query)).scalar_one_or_none()
+        # Failed exchanges commit right away; the 401 that follows would roll back a unit of work.
+        if user_id is None:
+            await cls._revoke_family_on_reuse(session, token_hash)
+            await session.commit()
+            return None
+
+        user = await session.get(User, user_id)
+        if user is None or user.is_locked or not user.email_verified:
+            await session.commit()
+            return None
+        new_token = await cls.issue(session, user.id, commit=False)
+        await commit_or_flush(session)
+        return user, new_token
+
+    @classmethod
+    async def _revoke_family_on_reuse(cls, session: AsyncSession, token_hash: str):
+        query = select(RefreshToken.user_id).where(
+            RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_not(None)
+        )
+        user_id = (await session.execute(query)).scalar_one_or_none()
+        if user_id is not None:
+            logger.warning(f"Rotated refresh token reused for user {user_id}; revoking all of their refresh tokens.")
+            await cls.revoke_all_for_user(session, user_id, commit=False)
+
+    @classmethod
+    async def revoke(cls, session: AsyncSession, token: str) -> bool:
+        query = (
+            update(RefreshToken)
+            .where(RefreshToken.token_hash == cls._digest(token), RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+            .returning(RefreshToken.id)
+        )
+        revoked = (await session.execute(query)).scalar_one_or_none() is not None
+        await commit_or_flush(session)
+        return revoked
+
+    @classmethod
+    async def revoke_all_for_user(cls, session: AsyncSession, user_id: UUID, commit: bool = True) -> int:
+        query = (
+            update(RefreshToken)
+            .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+        )
+        result = await session.execute(query)
+        if commit:
+            await commit_or_flush(session)
+        return result.rowcount
@@ -0,0 +1,183 @@
+# user_import_service.py
+"""
+Bulk user import from CSV or JSONL.
+
+Rows are read lazily from a text stream and handled in chunks. Each chunk is validated with
+`UserCreate`, hashed in the bcrypt worker pool, written with one multi-row
+INSERT ... ON CONFLICT DO NOTHING and committed. Rows that fail validation or collide with an
+existing email or nickname are reported by line number, and the rest of the file still loads.
+Reading and parsing run in a worker thread, since uploads are spooled to disk and read with
+blocking calls.
+"""
+from builtins import Exception, ValueError, bool, dict, enumerate, isinstance, len, list, range, set, str, zip
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import uuid
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import Row, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_settings
+from app.models.user_model import User
+from app.schemas.user_schemas import UserCreate, UserImportReport, UserImportRowError
+from app.services.email_service import EmailService
+from app.utils.nickname_gen import generate_nickname
+from app.utils.security import generate_verification_token, hash_passwords_async
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Columns returned for each inserted row: enough to send its verification email.
+CREATED_COLUMNS = [User.id, User.email, User.nickname, User.first_name, User.verification_token]
+
+def iter_import_rows(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield `(line_number, row)` for each record; a JSONL line that is not valid JSON is yielded
+    as the parse error so it can be reported with the other row errors.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Empty cells mean "not provided"; a key of None collects cells beyond the header.
+            yield reader.line_num, {key: value for key, value in row.items() if key is not None and value != ""}
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+def _read_chunk(rows: Iterator[Tuple[int, Any]], chunk: List, size: int):
+    # Appends in place so the rows read before a decoding error are kept.
+    for row in itertools.islice(rows, size):
+        chunk.append(row)
+
+async def send_verification_emails(email_service: EmailService, users: List[Row]):
+    """Send verification emails for imported users; failures are logged, not raised."""
+    for user in users:
+        try:
+            await email_service.send_verification_email(user)
+        except Exception as e:
+            logger.error(f"Failed to send verification email to {user.email}: {e}")
+
+class UserImportService:
+    @classmethod
+    async def import_rows(
+        cls,
+        session: AsyncSession,
+        rows: Iterable[Tuple[int, Any]],
+        on_created: Optional[Callable[[List[Row]], None]] = None,
+        chunk_size: Optional[int] = None,
+    ) -> UserImportReport:
+        """
+        Import `(line_number, row)` pairs, committing each chunk as it is written.
+
+        :param on_created: Called with the `CREATED_COLUMNS` rows of every committed chunk, e.g.
+            to queue verification emails.
+        """
+        chunk_size = chunk_size or settings.user_import_chunk_size
+        report = UserImportReport(created=0, failed=0, errors=[])
+        rows = iter(rows)
+        last_line = 0
+        while True:
+            chunk = []
+            try:
+                await asyncio.to_thread(_read_chunk, rows, chunk, chunk_size)
+            except UnicodeDecodeError:
+                # Earlier chunks are already committed; load what was read and report where it stopped.
+                last_line = chunk[-1][0] if chunk else last_line
+                cls._fail(report, last_line + 1, None, ["File is not valid UTF-8 from this line on; import stopped"])
+                await cls._import_chunk(session, chunk, report, on_created)
+                break
+            if not chunk:
+                break
+            last_line = chunk[-1][0]
+            await cls._import_chunk(session, chunk, report, on_created)
+        report.errors.sort(key=lambda error: error.row)
+        return report
+
+    @staticmethod
+    def _fail(report: UserImportReport, line_number: int, email: Optional[str], errors: List[str]):
+        report.failed += 1
+        report.errors.append(UserImportRowError(row=line_number, email=email, errors=errors))
+
+    @classmethod
+    def _validate(cls, chunk, report: UserImportReport) -> List[Tuple[int, dict]]:
+        valid = []
+        for line_number, row in chunk:
+            if isinstance(row, Exception):
+                cls._fail(report, line_number, None, [f"Invalid JSON: {row}"])
+            elif not isinstance(row, dict):
+                cls._fail(report, line_number, None, ["Row must be an object"])
+            else:
+                try:
+                    valid.append((line_number, UserCreate(**row).model_dump()))
+                except ValidationError as e:
+                    errors = [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+                    cls._fail(report, line_number, row.get("email"), errors)
+        return valid
+
+    @classmethod
+    async def _import_chunk(cls, session: AsyncSession, chunk, report: UserImportReport, on_created):
+        valid = cls._validate(chunk, report)
+        if not valid:
+            return
+        hashed_passwords = await hash_passwords_async([data.pop("password") for _, data in valid])
+        pending = {}  # id -> (line_number, values, nickname was requested)
+        for (line_number, data), hashed_password in zip(valid, hashed_passwords):
+            values = dict(
+                data,
+                id=uuid.uuid4(),
+                hashed_password=hashed_password,
+                verification_token=generate_verification_token(),
+                nickname=data["nickname"] or generate_nickname(settings.nickname_suffix_digits),
+            )
+            pending[values["id"]] = (line_number, values, bool(data["nickname"]))
+
+        created = []
+        # A second pass only retries rows whose generated nickname collided.
+        for _ in range(2):
+            query = (
+                pg_insert(User.__table__)
+                .values([values for _, values, _ in pending.values()])
+                .on_conflict_do_nothing()
+                .returning(*CREATED_COLUMNS)
+            )
+            for row in (await session.execute(query)).all():
+                created.append(row)
+                del pending[row.id]
+            if not pending:
+                break
+            emails = [values["email"] for _, values, _ in pending.values()]
+            # Emails were lowercased by UserCreate; compare against the lower(email) index.
+            stored = func.lower(User.email)
+            taken = set((await session.execute(select(stored).where(stored.in_(emails)))).scalars())
+            for user_id, (line_number, values, requested_nickname) in list(pending.items()):
+                if values["email"] in taken:
+                    cls._fail(report, line_number, values["email"], ["Email already exists"])
+                elif requested_nickname:
+                    cls._fail(report, line_number, values["email"], ["Nickname already exists"])
+                else:
+                    values["nickname"] = generate_nickname(settings.nickname_suffix_digits)
+                    continue
+                del pending[user_id]
+            if not pending:
+                break
+        for line_number, values, _ in pending.values():
+            cls._fail(report, line_number, values["email"], ["Nickname already exists"])
+
+        # Each chunk stands alone, so a failure later in the file keeps what was already loaded.
+        await session.commit()
+        report.created += len(created)
+        if on_created and created:
+            on_created(created)
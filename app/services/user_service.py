@@ -1,34 +1,53 @@
 # user_service.py
-from builtins import Exception, bool, classmethod, int, str
+from builtins import Exception, RuntimeError, ValueError, bool, classmethod, int, len, list, range, set, str
 from datetime import datetime, timezone
 import secrets
-from typing import Optional, Dict, List
+import time
+from typing import Optional, Dict, List, Tuple
 from pydantic import ValidationError
-from sqlalchemy import func, null, update, select
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import Row, any_, bindparam, delete, func, null, or_, text, tuple_, update, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 from app.dependencies import get_email_service, get_settings
+from app.database import UNIT_OF_WORK, after_commit, commit_or_flush
+from app.models.user_count_model import UserCount
 from app.models.user_model import User
-from app.schemas.user_schemas import UserCreate, UserUpdate
-from app.utils.nickname_gen import generate_nickname
-from app.utils.security import generate_verification_token, hash_password, verify_password
+from app.schemas.user_schemas import UserCreate, UserFilter, UserResponse, UserUpdate
+from app.utils.cursor import decode_cursor, encode_cursor
+from app.utils.nickname_gen import generate_nickname, generate_nickname_candidates
+from app.utils.tracing import trace_methods
+from app.utils.security import generate_verification_token, hash_password_async, password_needs_rehash, verify_password_async
 from uuid import UUID
 from app.services.email_service import EmailService
+from app.services.refresh_token_service import RefreshTokenService
 from app.models.user_model import UserRole
 import logging
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Columns rendered by UserResponse; read-only paths select just these instead of whole users.
+USER_RESPONSE_COLUMNS = [getattr(User, name) for name in UserResponse.model_fields]
+
+class DuplicateUserError(ValueError):
+    """Raised when a new user's email or nickname is already taken."""
+
+    def __init__(self, field: str):
+        self.field = field
+        super().__init__(f"{field.capitalize()} already exists")
+
+@trace_methods()
 class UserService:
     @classmethod
     async def _execute_query(cls, session: AsyncSession, query):
         try:
-            result = await session.execute(query)
-            await session.commit()
-            return result
+            return await session.execute(query)
         except SQLAlchemyError as e:
             logger.error(f"Database error: {e}")
+            if session.info.get(UNIT_OF_WORK):
+                raise  # get_db rolls back the whole request
             await session.rollback()
             return None
 
@@ -42,102 +61,320 @@ class UserService:
     async def get_by_id(cls, session: AsyncSession, user_id: UUID) -> Optional[User]:
         return await cls._fetch_user(session, id=user_id)
 
+    @classmethod
+    async def get_user_row(cls, session: AsyncSession, user_id: UUID) -> Optional[Row]:
+        """Fetch only the `USER_RESPONSE_COLUMNS` of one user as a plain row."""
+        result = await cls._execute_query(session, select(*USER_RESPONSE_COLUMNS).where(User.id == user_id))
+        return result.first() if result else None
+
+    @classmethod
+    async def get_user_rows_by_ids(cls, session: AsyncSession, user_ids: List[UUID]) -> Dict[UUID, Row]:
+        """
+        Fetch the `USER_RESPONSE_COLUMNS` of many users in one query, keyed by ID.
+
+        The IDs are bound as a single array for `id = ANY(:ids)`, so the statement text (and its
+        prepared statement) is the same for any number of IDs.
+        """
+        ids = bindparam("ids", list(user_ids), type_=ARRAY(PG_UUID(as_uuid=True)))
+        result = await cls._execute_query(session, select(*USER_RESPONSE_COLUMNS).where(User.id == any_(ids)))
+        return {row.id: row for row in result.all()} if result else {}
+
     @classmethod
     async def get_by_nickname(cls, session: AsyncSession, nickname: str) -> Optional[User]:
         return await cls._fetch_user(session, nickname=nickname)
 
+    @staticmethod
+    def _email_matches(email: str):
+        """Case-insensitive email match in the form served by the `ix_users_email_lower` index."""
+        return func.lower(User.email) == func.lower(email)
+
     @classmethod
     async def get_by_email(cls, session: AsyncSession, email: str) -> Optional[User]:
-        return await cls._fetch_user(session, email=email)
+        result = await cls._execute_query(session, select(User).where(cls._email_matches(email)))
+        return result.scalars().first() if result else None
 
     @classmethod
     async def create(cls, session: AsyncSession, user_data: Dict[str, str], email_service: EmailService) -> Optional[User]:
+        """
+        Insert a new user, relying on the unique email and nickname indexes instead of pre-checks.
+
+        A normal registration is a single INSERT ... ON CONFLICT DO NOTHING RETURNING. Only when
+        that inserts nothing is the conflict classified; a generated nickname that collided is
+        replaced via `allocate_nickname`, and if that one is taken too by a concurrent
+        registration, by a random-suffix nickname. The verification email goes out after the commit.
+
+        Raises:
+            DuplicateUserError: If the email, or a nickname chosen by the caller, is taken.
+        """
         try:
             validated_data = UserCreate(**user_data).model_dump()
-            existing_user = await cls.get_by_email(session, validated_data['email'])
-            if existing_user:
-                logger.error("User with given email already exists.")
-                return None
-            validated_data['hashed_password'] = hash_password(validated_data.pop('password'))
-            new_user = User(**validated_data)
-            new_user.verification_token = generate_verification_token()
-            new_nickname = generate_nickname()
-            while await cls.get_by_nickname(session, new_nickname):
-                new_nickname = generate_nickname()
-            new_user.nickname = new_nickname
-            session.add(new_user)
-            await session.commit()
-            await email_service.send_verification_email(new_user)
-            
-            return new_user
         except ValidationError as e:
             logger.error(f"Validation error during user creation: {e}")
             return None
+        requested_nickname = validated_data.get('nickname')
+        validated_data['hashed_password'] = await hash_password_async(validated_data.pop('password'))
+        validated_data['verification_token'] = generate_verification_token()
+        validated_data['nickname'] = requested_nickname or generate_nickname(settings.nickname_suffix_digits)
+
+        for attempt in range(3):
+            new_user = await cls._insert_user(session, validated_data)
+            if new_user is not None:
+                break
+            result = await session.execute(select(User.id).where(cls._email_matches(validated_data['email'])))
+            if result.first() is not None:
+                raise DuplicateUserError("email")
+            if requested_nickname:
+                raise DuplicateUserError("nickname")
+            if attempt == 0:
+                validated_data['nickname'] = await cls.allocate_nickname(session)
+            else:
+                validated_data['nickname'] = cls._fallback_nickname()
+        else:
+            raise RuntimeError("Could not allocate a unique nickname")
+        await commit_or_flush(session)
+        await after_commit(session, lambda: email_service.send_verification_email(new_user))
+        return new_user
+
+    @classmethod
+    async def _insert_user(cls, session: AsyncSession, values: Dict) -> Optional[User]:
+        """INSERT the row unless it violates a unique index; returns None on conflict."""
+        query = pg_insert(User).values(**values).on_conflict_do_nothing().returning(User)
+        result = await session.execute(query)
+        return result.scalars().first()
+
+    @classmethod
+    async def allocate_nickname(cls, session: AsyncSession) -> str:
+        """
+        Pick an unused nickname in at most `nickname_max_batches` queries.
+
+        Each query checks a batch of random candidates with one `IN` lookup. If every batch is
+        taken, a nickname with an extra random 32-bit hex suffix is returned unchecked; the unique
+        constraint still guards the insert.
+        """
+        for _ in range(settings.nickname_max_batches):
+            candidates = generate_nickname_candidates(settings.nickname_batch_size, settings.nickname_suffix_digits)
+            result = await cls._execute_query(session, select(User.nickname).where(User.nickname.in_(candidates)))
+            taken = set(result.scalars().all()) if result else set(candidates)
+            for candidate in candidates:
+                if candidate not in taken:
+                    return candidate
+        logger.warning("Nickname candidates exhausted; falling back to a random suffix.")
+        return cls._fallback_nickname()
+
+    @staticmethod
+    def _fallback_nickname() -> str:
+        """A generated nickname with an extra random 32-bit hex suffix, unique without a lookup in practice."""
+        return f"{generate_nickname(settings.nickname_suffix_digits)}_{secrets.token_hex(4)}"
 
     @classmethod
     async def update(cls, session: AsyncSession, user_id: UUID, update_data: Dict[str, str]) -> Optional[User]:
+        """
+        Apply `update_data` in one UPDATE ... RETURNING; returns the updated user, or None if not found.
+
+        A new password also revokes the user's refresh tokens in the same transaction.
+
+        Raises:
+            DuplicateUserError: If the new email or nickname belongs to another user.
+        """
         try:
-            # validated_data = UserUpdate(**update_data).dict(exclude_unset=True)
-            validated_data = UserUpdate(**update_data).dict(exclude_unset=True)
-
-            if 'password' in validated_data:
-                validated_data['hashed_password'] = hash_password(validated_data.pop('password'))
-            query = update(User).where(User.id == user_id).values(**validated_data).execution_options(synchronize_session="fetch")
-            await cls._execute_query(session, query)
-            updated_user = await cls.get_by_id(session, user_id)
-            if updated_user:
-                session.refresh(updated_user)  # Explicitly refresh the updated user object
-                logger.info(f"User {user_id} updated successfully.")
-                return updated_user
-            else:
-                logger.error(f"User {user_id} not found after update attempt.")
+            validated_data = UserUpdate(**update_data).model_dump(exclude_unset=True)
+        except ValidationError as e:
+            logger.error(f"Validation error during user update: {e}")
             return None
-        except Exception as e:  # Broad exception handling for debugging
-            logger.error(f"Error during user update: {e}")
+        if 'password' in validated_data:
+            validated_data['hashed_password'] = await hash_password_async(validated_data.pop('password'))
+        query = (
+            update(User)
+            .where(User.id == user_id)
+            .values(**validated_data)
+            .returning(User)
+            .execution_options(synchronize_session="fetch")
+        )
+        try:
+            result = await session.execute(query)
+        except IntegrityError as e:
+            if not session.info.get(UNIT_OF_WORK):
+                await session.rollback()
+            raise DuplicateUserError(cls._conflicting_field(e)) from e
+        updated_user = result.scalars().first()
+        if updated_user is None:
+            logger.error(f"User {user_id} not found for update.")
             return None
+        if 'hashed_password' in validated_data:
+            await RefreshTokenService.revoke_all_for_user(session, user_id, commit=False)
+        await commit_or_flush(session)
+        logger.info(f"User {user_id} updated successfully.")
+        return updated_user
+
+    @staticmethod
+    def _conflicting_field(error: IntegrityError) -> str:
+        """Name the user field behind a unique violation: ix_users_email_lower or ix_users_nickname."""
+        constraint = getattr(error.orig.__cause__, "constraint_name", None) or str(error.orig)
+        return "email" if "email" in constraint else "nickname"
 
     @classmethod
     async def delete(cls, session: AsyncSession, user_id: UUID) -> bool:
-        user = await cls.get_by_id(session, user_id)
-        if not user:
+        """Delete a user in one DELETE ... RETURNING; returns False if no such user exists."""
+        query = delete(User).where(User.id == user_id).returning(User.id)
+        result = await cls._execute_query(session, query)
+        if result is None or result.scalar_one_or_none() is None:
             logger.info(f"User with ID {user_id} not found.")
             return False
-        await session.delete(user)
-        await session.commit()
+        await commit_or_flush(session)
         return True
 
+    @staticmethod
+    def _filter_conditions(filters: Optional[UserFilter]) -> List:
+        """
+        WHERE clauses for `filters`. `search` is an ILIKE substring match so the pg_trgm GIN
+        indexes can serve it; LIKE wildcards in the term are escaped.
+        """
+        if filters is None:
+            return []
+        conditions = []
+        if filters.role is not None:
+            conditions.append(User.role == UserRole[filters.role.name])
+        for flag in ("email_verified", "is_locked", "is_professional"):
+            value = getattr(filters, flag)
+            if value is not None:
+                conditions.append(getattr(User, flag) == value)
+        if filters.created_after is not None:
+            conditions.append(User.created_at >= filters.created_after)
+        if filters.created_before is not None:
+            conditions.append(User.created_at < filters.created_before)
+        if filters.search:
+            term = filters.search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = f"%{term}%"
+            conditions.append(or_(*(
+                column.ilike(pattern, escape="\\")
+                for column in (User.nickname, User.email, User.first_name, User.last_name)
+            )))
+        return conditions
+
     @classmethod
-    async def list_users(cls, session: AsyncSession, skip: int = 0, limit: int = 10) -> List[User]:
-        query = select(User).offset(skip).limit(limit)
+    async def list_users(cls, session: AsyncSession, skip: int = 0, limit: int = 10, filters: Optional[UserFilter] = None) -> List[User]:
+        query = select(User).where(*cls._filter_conditions(filters)).order_by(User.created_at, User.id).offset(skip).limit(limit)
         result = await cls._execute_query(session, query)
         return result.scalars().all() if result else []
 
+    @classmethod
+    async def list_user_rows(cls, session: AsyncSession, skip: int = 0, limit: int = 10, filters: Optional[UserFilter] = None) -> List[Row]:
+        """
+        Same page as `list_users`, reading only `USER_RESPONSE_COLUMNS` into plain rows.
+
+        Rows skip ORM instance construction and the identity map, and never load columns such as
+        `hashed_password` that responses do not show.
+        """
+        query = (
+            select(*USER_RESPONSE_COLUMNS)
+            .where(*cls._filter_conditions(filters))
+            .order_by(User.created_at, User.id)
+            .offset(skip)
+            .limit(limit)
+        )
+        result = await cls._execute_query(session, query)
+        return result.all() if result else []
+
+    @classmethod
+    async def list_users_keyset(
+        cls,
+        session: AsyncSession,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        columns: Optional[List] = None,
+        filters: Optional[UserFilter] = None,
+    ) -> Tuple[List[User], Optional[str], Optional[str]]:
+        """
+        Page through users ordered by `(created_at, id)` using the `ix_users_created_at_id` index.
+
+        Each page is a single index range scan from the cursor position, so deep pages cost the
+        same as the first. Returns the page with the next and previous cursors, None at either end.
+        With `columns` (e.g. `USER_RESPONSE_COLUMNS`) the page holds plain rows of those columns.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        position = decode_cursor(cursor) if cursor else None
+        backwards = position is not None and position.backwards
+        key = tuple_(User.created_at, User.id)
+        query = select(*columns, User.created_at) if columns else select(User)
+        query = query.where(*cls._filter_conditions(filters))
+        if position is not None:
+            bound = tuple_(position.created_at, position.id)
+            query = query.where(key < bound if backwards else key > bound)
+        if backwards:
+            query = query.order_by(User.created_at.desc(), User.id.desc())
+        else:
+            query = query.order_by(User.created_at, User.id)
+        result = await cls._execute_query(session, query.limit(limit + 1))
+        users = list(result.all() if columns else result.scalars().all()) if result else []
+        has_more = len(users) > limit
+        users = users[:limit]
+        if backwards:
+            users.reverse()
+        if not users:
+            return users, None, None
+        # Reading backwards started from a row after this page; reading forwards from a cursor, one before it.
+        more_after = True if backwards else has_more
+        more_before = has_more if backwards else position is not None
+        next_cursor = encode_cursor(users[-1].created_at, users[-1].id) if more_after else None
+        prev_cursor = encode_cursor(users[0].created_at, users[0].id, backwards=True) if more_before else None
+        return users, next_cursor, prev_cursor
+
     @classmethod
     async def register_user(cls, session: AsyncSession, user_data: Dict[str, str], get_email_service) -> Optional[User]:
         return await cls.create(session, user_data, get_email_service)
     
 
+    @classmethod
+    async def authenticate(cls, session: AsyncSession, email: str, password: str) -> Tuple[Optional[User], bool]:
+        """
+        Check a login attempt with one user fetch and one UPDATE.
+
+        :return: `(user, locked)`; `user` is set only on success and `locked` is True when the
+            account was already locked before this attempt.
+        """
+        result = await session.execute(select(User).where(cls._email_matches(email)))
+        user = result.scalars().first()
+        if user is None:
+            return None, False
+        if user.is_locked:
+            return None, True
+        if user.email_verified is False:
+            return None, False
+
+        if await verify_password_async(password, user.hashed_password):
+            user.failed_login_attempts = 0
+            user.last_login_at = datetime.now(timezone.utc)
+            if password_needs_rehash(user.hashed_password):
+                # Move the stored hash to the configured cost while we hold the plain password.
+                user.hashed_password = await hash_password_async(password)
+            session.add(user)
+            await commit_or_flush(session)
+            return user, False
+
+        # Increment and lock in the database so concurrent failures cannot lose updates.
+        attempts = func.coalesce(User.failed_login_attempts, 0) + 1
+        query = (
+            update(User)
+            .where(User.id == user.id)
+            .values(
+                failed_login_attempts=attempts,
+                is_locked=or_(func.coalesce(User.is_locked, False), attempts >= settings.max_login_attempts),
+            )
+            .returning(User.failed_login_attempts, User.is_locked)
+            .execution_options(synchronize_session=False)
+        )
+        failed_login_attempts, is_locked = (await session.execute(query)).one()
+        await session.commit()  # not deferred to the unit of work: the 401 that follows would roll it back
+        set_committed_value(user, 'failed_login_attempts', failed_login_attempts)
+        set_committed_value(user, 'is_locked', is_locked)
+        return None, False
+
     @classmethod
     async def login_user(cls, session: AsyncSession, email: str, password: str) -> Optional[User]:
-        user = await cls.get_by_email(session, email)
-        if user:
-            if user.email_verified is False:
-                return None
-            if user.is_locked:
-                return None
-            if verify_password(password, user.hashed_password):
-                user.failed_login_attempts = 0
-                user.last_login_at = datetime.now(timezone.utc)
-                session.add(user)
-                await session.commit()
-                return user
-            else:
-                user.failed_login_attempts += 1
-                if user.failed_login_attempts >= settings.max_login_attempts:
-                    user.is_locked = True
-                session.add(user)
-                await session.commit()
-        return None
+        user, _ = await cls.authenticate(session, email, password)
+        return user
 
     @classmethod
     async def is_account_locked(cls, session: AsyncSession, email: str) -> bool:
@@ -147,14 +384,16 @@ class UserService:
 
     @classmethod
     async def reset_password(cls, session: AsyncSession, user_id: UUID, new_password: str) -> bool:
-        hashed_password = hash_password(new_password)
+        """Set a new password, unlock the account and revoke every refresh token issued under the old one."""
+        hashed_password = await hash_password_async(new_password)
         user = await cls.get_by_id(session, user_id)
         if user:
             user.hashed_password = hashed_password
             user.failed_login_attempts = 0  # Resetting failed login attempts
             user.is_locked = False  # Unlocking the user account, if locked
             session.add(user)
-            await session.commit()
+            await RefreshTokenService.revoke_all_for_user(session, user_id, commit=False)
+            await commit_or_flush(session)
             return True
         return False
 
@@ -166,23 +405,65 @@ class UserService:
             user.verification_token = None  # Clear the token once used
             user.role = UserRole.AUTHENTICATED
             session.add(user)
-            await session.commit()
+            await commit_or_flush(session)
             return True
         return False
 
     @classmethod
-    async def count(cls, session: AsyncSession) -> int:
+    async def count(cls, session: AsyncSession, filters: Optional[UserFilter] = None) -> int:
         """
         Count the number of users in the database.
 
         :param session: The AsyncSession instance for database access.
+        :param filters: Only count users matching these filters.
         :return: The count of users.
         """
-        query = select(func.count()).select_from(User)
+        query = select(func.count()).select_from(User).where(*cls._filter_conditions(filters))
         result = await session.execute(query)
         count = result.scalar()
         return count
-    
+
+    _cached_count: Optional[Tuple[int, float]] = None  # (count, monotonic expiry)
+
+    @classmethod
+    async def total_count(
+        cls, session: AsyncSession, strategy: Optional[str] = None, filters: Optional[UserFilter] = None
+    ) -> Tuple[int, bool]:
+        """
+        Total number of users for listings, returned as `(count, is_exact)`.
+
+        Filtered totals are always counted exactly; the strategies only cover the whole table.
+
+        :param strategy: Defaults to `settings.user_count_strategy`:
+            - "exact": count(*) on every call.
+            - "cached": an exact count reused for `user_count_cache_ttl_seconds` in this process.
+            - "estimate": the planner's reltuples estimate, or an exact count for small tables.
+            - "counter": the trigger-maintained `user_counts` row, or an exact count while the
+              triggers are not installed.
+        """
+        if cls._filter_conditions(filters):
+            return await cls.count(session, filters), True
+        strategy = strategy or settings.user_count_strategy
+        if strategy == "cached":
+            now = time.monotonic()
+            if cls._cached_count is not None and cls._cached_count[1] > now:
+                return cls._cached_count[0], False
+            count = await cls.count(session)
+            cls._cached_count = (count, now + settings.user_count_cache_ttl_seconds)
+            return count, True
+        if strategy == "estimate":
+            # reltuples is -1 until the table is first vacuumed or analyzed.
+            result = await session.execute(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass"))
+            estimate = result.scalar()
+            if estimate is not None and estimate >= settings.user_count_estimate_min_rows:
+                return estimate, False
+        elif strategy == "counter":
+            result = await session.execute(select(UserCount.total).where(UserCount.id == 1))
+            count = result.scalar()
+            if count is not None:
+                return count, True
+        return await cls.count(session), True
+
     @classmethod
     async def unlock_user_account(cls, session: AsyncSession, user_id: UUID) -> bool:
         user = await cls.get_by_id(session, user_id)
@@ -190,6 +471,6 @@ class UserService:
             user.is_locked = False
             user.failed_login_attempts = 0  # Optionally reset failed login attempts
             session.add(user)
-            await session.commit()
+            await commit_or_flush(session)
             return True
         return False
@@ -0,0 +1,36 @@
+# cursor.py
+"""
+Opaque keyset pagination cursors.
+
+A cursor carries the `(created_at, id)` key of the row a page starts after, plus the direction
+to read in. It is URL-safe base64 over a compact JSON array so clients treat it as a token.
+"""
+from builtins import Exception, ValueError, bool, int, len, str
+import base64
+import json
+from datetime import datetime
+from typing import NamedTuple
+from uuid import UUID
+
+class Cursor(NamedTuple):
+    created_at: datetime
+    id: UUID
+    backwards: bool = False
+
+def encode_cursor(created_at: datetime, id: UUID, backwards: bool = False) -> str:
+    payload = json.dumps([created_at.isoformat(), str(id), int(backwards)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id, backwards = json.loads(base64.urlsafe_b64decode(padded))
+        return Cursor(datetime.fromisoformat(created_at), UUID(id), bool(backwards))
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
@@ -1,6 +1,6 @@
 # link_generation.py
 from builtins import dict, int, max, str
-from typing import List, Callable
+from typing import List, Callable, Optional
 from urllib.parse import urlencode
 from uuid import UUID
 
@@ -12,9 +12,9 @@ from app.schemas.pagination_schema import PaginationLink
 def create_link(rel: str, href: str, method: str = "GET", action: str = None) -> Link:
     return Link(rel=rel, href=href, method=method, action=action)
 
-def create_pagination_link(rel: str, base_url: str, params: dict) -> PaginationLink:
+def create_pagination_link(rel: str, base_url: str, params: dict, filters: Optional[dict] = None) -> PaginationLink:
     # Ensure parameters are added in a specific order
-    query_string = f"skip={params['skip']}&limit={params['limit']}"
+    query_string = urlencode({"skip": params["skip"], "limit": params["limit"], **(filters or {})})
     return PaginationLink(rel=rel, href=f"{base_url}?{query_string}")
 
 def create_user_links(user_id: UUID, request: Request) -> List[Link]:
@@ -31,19 +31,50 @@ def create_user_links(user_id: UUID, request: Request) -> List[Link]:
         for rel, action, method, action_desc in actions
     ]
 
-def generate_pagination_links(request: Request, skip: int, limit: int, total_items: int) -> List[PaginationLink]:
-    base_url = str(request.url)
+def generate_pagination_links(
+    request: Request, skip: int, limit: int, total_items: int, filters: Optional[dict] = None
+) -> List[PaginationLink]:
+    """`filters` are query parameters carried over to every link."""
+    base_url = str(request.url).split("?", 1)[0]
     total_pages = (total_items + limit - 1) // limit
     links = [
-        create_pagination_link("self", base_url, {'skip': skip, 'limit': limit}),
-        create_pagination_link("first", base_url, {'skip': 0, 'limit': limit}),
-        create_pagination_link("last", base_url, {'skip': max(0, (total_pages - 1) * limit), 'limit': limit})
+        create_pagination_link("self", base_url, {'skip': skip, 'limit': limit}, filters),
+        create_pagination_link("first", base_url, {'skip': 0, 'limit': limit}, filters),
+        create_pagination_link("last", base_url, {'skip': max(0, (total_pages - 1) * limit), 'limit': limit}, filters)
     ]
 
     if skip + limit < total_items:
-        links.append(create_pagination_link("next", base_url, {'skip': skip + limit, 'limit': limit}))
+        links.append(create_pagination_link("next", base_url, {'skip': skip + limit, 'limit': limit}, filters))
 
     if skip > 0:
-        links.append(create_pagination_link("prev", base_url, {'skip': max(skip - limit, 0), 'limit': limit}))
+        links.append(create_pagination_link("prev", base_url, {'skip': max(skip - limit, 0), 'limit': limit}, filters))
 
     return links
+
+def create_cursor_link(
+    rel: str, base_url: str, limit: int, cursor: Optional[str] = None, filters: Optional[dict] = None
+) -> PaginationLink:
+    params = {"pagination": "cursor", "limit": limit, **(filters or {})}
+    if cursor:
+        params["cursor"] = cursor
+    return PaginationLink(rel=rel, href=f"{base_url}?{urlencode(params)}")
+
+def generate_cursor_pagination_links(
+    request: Request,
+    limit: int,
+    cursor: Optional[str],
+    next_cursor: Optional[str],
+    prev_cursor: Optional[str],
+    filters: Optional[dict] = None,
+) -> List[PaginationLink]:
+    """Links for keyset pagination; there is no `last` link because pages are not numbered."""
+    base_url = str(request.url).split("?", 1)[0]
+    links = [
+        create_cursor_link("self", base_url, limit, cursor, filters),
+        create_cursor_link("first", base_url, limit, filters=filters),
+    ]
+    if next_cursor:
+        links.append(create_cursor_link("next", base_url, limit, next_cursor, filters))
+    if prev_cursor:
+        links.append(create_cursor_link("prev", base_url, limit, prev_cursor, filters))
+    return links
@@ -0,0 +1,129 @@
+# loop_monitor.py
+"""
+Event-loop lag watchdog.
+
+A heartbeat task sleeps for `interval` in a loop and records how late it wakes up; that delay
+is the time the loop spent running something else without yielding. The lag goes into the
+`event_loop_lag_seconds` histogram and a rolling window published as
+`event_loop_lag_recent_seconds{quantile=...}`.
+
+Lag is only measured after the fact, so a watchdog thread also checks the heartbeat. When it
+is `threshold` overdue, the thread captures the loop thread's stack while the blocking call
+is still running, logs it and counts it in `event_loop_blocked_total`. Typical culprits are
+sync SMTP, file I/O, template rendering, and bcrypt outside the worker pool.
+"""
+from builtins import RuntimeError, float, int, len, max, min, round, sorted, str
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import suppress
+from typing import Dict, Optional, Tuple
+from app.utils.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+lag_seconds = Histogram(
+    "event_loop_lag_seconds", "How late the event loop heartbeat woke up.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+blocked_total = Counter("event_loop_blocked_total", "Times the event loop stayed blocked past the lag threshold.")
+
+_active_monitor: Optional["LoopLagMonitor"] = None
+
+def _recent_quantiles() -> Dict[Tuple[str, ...], float]:
+    return _active_monitor.quantiles() if _active_monitor is not None else {}
+
+recent_lag = Gauge(
+    "event_loop_lag_recent_seconds", "Event loop lag quantiles over the recent window.", ["quantile"],
+    collect=_recent_quantiles,
+)
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, window: int = 600):
+        """
+        :param interval: Seconds between heartbeats.
+        :param threshold: Lag, in seconds, at which the blocking stack is captured.
+        :param window: Heartbeats kept for the recent quantiles (600 x 0.1 s = one minute).
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self._recent = deque(maxlen=window)
+        self.blocked_count = 0
+        self.last_blocked_stack: Optional[str] = None
+        self._loop = None
+        self._task = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the heartbeat on the running loop and the watchdog thread."""
+        global _active_monitor
+        if self._task is not None:
+            raise RuntimeError("Loop lag monitor is already running")
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = self._loop.create_task(self._heartbeat(), name="loop-lag-heartbeat")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        _active_monitor = self
+
+    async def stop(self):
+        global _active_monitor
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._watchdog.join(timeout=1)
+        self._task = self._watchdog = None
+        if _active_monitor is self:
+            _active_monitor = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            self._recent.append(lag)
+            lag_seconds.observe(lag)
+
+    def _watch(self):
+        reported_beat = None
+        poll = max(0.005, min(self.interval, self.threshold) / 2)
+        while not self._stopping.wait(poll):
+            beat = self._last_beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue >= self.threshold and beat != reported_beat:
+                reported_beat = beat  # one report per stall
+                self._report_blocked(overdue)
+
+    def _report_blocked(self, overdue: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "<stack unavailable>\n"
+        task = asyncio.current_task(self._loop)
+        task_name = task.get_name() if task is not None else "<no task>"
+        self.blocked_count += 1
+        self.last_blocked_stack = stack
+        blocked_total.inc()
+        logger.warning(
+            f"Event loop blocked for at least {overdue * 1000:.0f} ms in {task_name}:\n{stack}",
+            extra={"loop_blocked_ms": round(overdue * 1000, 1), "task": task_name},
+        )
+
+    def quantiles(self) -> Dict[Tuple[str, ...], float]:
+        """Lag quantiles over the recent window, keyed for `event_loop_lag_recent_seconds`."""
+        samples = sorted(self._recent)
+        if not samples:
+            return {}
+        return {(str(q),): samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
@@ -0,0 +1,171 @@
+# metrics.py
+"""
+In-process metrics rendered in the Prometheus text exposition format (version 0.0.4).
+
+Counters, gauges and histograms register themselves with `REGISTRY` when created and are
+updated from the event loop thread. A metric built with `collect=` reads its values when
+scraped instead, for figures that already live elsewhere such as pool statistics. Values are
+per process: with several gunicorn workers, scrape each worker or aggregate in Prometheus.
+"""
+from builtins import ValueError, dict, enumerate, float, int, len, list, repr, set, str, tuple, zip
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric"):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None,
+        registry: Registry = REGISTRY,
+    ):
+        """
+        :param collect: Returns `{label values: value}` at scrape time; the metric then holds no
+            values of its own.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0.0}
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        values = self._collect() if self._collect else self._values
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values.items()]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry=registry)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], List] = {}  # label values -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        series = self._series.setdefault(self._key(labels), [[0] * len(self.buckets), 0.0, 0])
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        bucket_labels = self.labelnames + ("le",)
+        for key, (bucket_counts, total, count) in self._series.items():
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                labels = _format_labels(bucket_labels, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(bucket_count)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {_format_value(count)}")
+        return lines
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route name.", ["route", "method"]
+)
+http_requests_total = Counter("http_requests_total", "Requests served, by route name and status.", ["route", "method", "status"])
+http_requests_in_flight = Gauge("http_requests_in_flight", "Requests currently being served.")
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times each HTTP request and tracks how many are in flight.
+
+    Requests are labelled with the matched route's name (`get_user`, `list_users`, ...), never
+    the raw path, so IDs in URLs cannot blow up the number of series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")  # set on the shared scope by the router once matched
+            name = route.name if route is not None else "unmatched"
+            http_request_seconds.observe(time.perf_counter() - start, route=name, method=scope["method"])
+            http_requests_total.inc(route=name, method=scope["method"], status=str(status_code))
@@ -1,11 +1,43 @@
 # nickname_generation.py
-from builtins import str
+from builtins import int, len, list, min, set, str
 import random
+from typing import List
 
+ADJECTIVES = [
+    "agile", "amber", "ancient", "arctic", "azure", "bold", "brave", "breezy",
+    "bright", "brisk", "calm", "candid", "cheerful", "clever", "cosmic", "crimson",
+    "curious", "daring", "dazzling", "eager", "electric", "fancy", "fearless", "fierce",
+    "frosty", "gentle", "gilded", "glad", "golden", "grand", "happy", "hidden",
+    "humble", "icy", "jolly", "keen", "kind", "lively", "lucky", "lunar",
+    "mellow", "merry", "mighty", "misty", "noble", "nimble", "polar", "proud",
+    "quick", "quiet", "rapid", "royal", "rustic", "scarlet", "shiny", "silent",
+    "silver", "sly", "snowy", "solar", "swift", "vivid", "witty", "zesty",
+]
 
-def generate_nickname() -> str:
-    """Generate a URL-safe nickname using adjectives and animal names."""
-    adjectives = ["clever", "jolly", "brave", "sly", "gentle"]
-    animals = ["panda", "fox", "raccoon", "koala", "lion"]
-    number = random.randint(0, 999)
-    return f"{random.choice(adjectives)}_{random.choice(animals)}_{number}"
+ANIMALS = [
+    "alpaca", "badger", "beaver", "bison", "bobcat", "camel", "cheetah", "cobra",
+    "condor", "coyote", "crane", "dingo", "dolphin", "eagle", "falcon", "ferret",
+    "finch", "fox", "gazelle", "gecko", "gibbon", "heron", "hyena", "ibis",
+    "iguana", "jackal", "jaguar", "koala", "lemur", "leopard", "lion", "llama",
+    "lynx", "marmot", "meerkat", "mink", "moose", "narwhal", "ocelot", "orca",
+    "osprey", "otter", "owl", "panda", "panther", "pelican", "penguin", "puffin",
+    "puma", "quokka", "rabbit", "raccoon", "raven", "salmon", "seal", "sparrow",
+    "stork", "tapir", "tiger", "toucan", "walrus", "weasel", "wombat", "yak",
+]
+
+def nickname_space(suffix_digits: int = 4) -> int:
+    """Number of distinct nicknames `generate_nickname` can produce."""
+    return len(ADJECTIVES) * len(ANIMALS) * 10 ** suffix_digits
+
+def generate_nickname(suffix_digits: int = 4) -> str:
+    """Generate a URL-safe nickname using adjectives, animal names and a numeric suffix."""
+    number = random.randrange(10 ** suffix_digits)
+    return f"{random.choice(ADJECTIVES)}_{random.choice(ANIMALS)}_{number}"
+
+def generate_nickname_candidates(count: int, suffix_digits: int = 4) -> List[str]:
+    """Generate `count` distinct nicknames to check for availability in one query."""
+    count = min(count, nickname_space(suffix_digits))
+    candidates = set()
+    while len(candidates) < count:
+        candidates.add(generate_nickname(suffix_digits))
+    return list(candidates)
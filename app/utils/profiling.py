@@ -0,0 +1,85 @@
+# profiling.py
+"""
+On-demand cProfile profiling of live requests.
+
+`ProfilingMiddleware` is only installed when `settings.profiling_enabled` is set, so it costs
+nothing otherwise. When installed it profiles every `sample_every`-th request, plus any request
+sent with `X-Profile: 1` by an admin (checked against the bearer token). Profiles are merged
+per route name and written to `<output_dir>/<route>.prof` in pstats format, which snakeviz,
+flameprof or `python -m pstats` can read.
+
+cProfile follows the thread rather than the request, so other requests progressing on the event
+loop while one is profiled show up in its profile too. Only one request is profiled at a time.
+"""
+from builtins import OSError, bool, dict, int, str
+import cProfile
+import itertools
+import logging
+import os
+import pstats
+import re
+from typing import Dict, Optional
+from app.services.jwt_service import decode_token_cached
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+def _requested_by_admin(scope) -> bool:
+    headers = dict(scope.get("headers") or [])
+    if headers.get(PROFILE_HEADER) != b"1":
+        return False
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    claims = decode_token_cached(token)
+    return claims is not None and claims.get("role") == "ADMIN"
+
+class ProfilingMiddleware:
+    def __init__(self, app, output_dir: str, sample_every: int = 0):
+        """
+        :param sample_every: Profile one request in this many; 0 profiles only admin requests
+            carrying the `X-Profile: 1` header.
+        """
+        self.app = app
+        self.output_dir = output_dir
+        self.sample_every = sample_every
+        self._requests = itertools.count(1)
+        self._active = False
+        self._stats: Dict[str, pstats.Stats] = {}
+
+    def _should_profile(self, scope) -> bool:
+        if self._active:
+            return False
+        sampled = self.sample_every > 0 and next(self._requests) % self.sample_every == 0
+        return sampled or _requested_by_admin(scope)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            return await self.app(scope, receive, send)
+        self._active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            self._active = False
+            route = scope.get("route")
+            self._save(route.name if route is not None else "unmatched", profiler)
+
+    def _save(self, route_name: str, profiler: cProfile.Profile) -> Optional[str]:
+        """Merge `profiler` into the route's profile and rewrite its file; returns the path."""
+        stats = self._stats.get(route_name)
+        if stats is None:
+            stats = self._stats[route_name] = pstats.Stats(profiler)
+        else:
+            stats.add(profiler)
+        path = os.path.join(self.output_dir, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', route_name)}.prof")
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            stats.dump_stats(path)
+        except OSError as e:
+            logger.error(f"Could not write profile {path}: {e}")
+            return None
+        return path
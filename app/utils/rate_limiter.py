@@ -0,0 +1,128 @@
+# rate_limiter.py
+"""
+Sliding-window rate limiting with pluggable storage.
+
+`InMemoryRateLimitStore` keeps per-key timestamp logs in the worker process and evicts the
+least recently used keys beyond a fixed budget. `SQLiteRateLimitStore` keeps the same log in a
+local SQLite file so every worker process on one host shares the counts.
+"""
+from builtins import Exception, NotImplementedError, float, int, len, max, str
+from collections import OrderedDict, deque
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+class RateLimitStore:
+    """Storage backend interface: record a hit for a key inside a sliding window."""
+
+    def hit(self, key: str, limit: int, window_seconds: float, now: float) -> float:
+        """Record an attempt; return 0 if allowed, else the seconds until the next attempt is allowed."""
+        raise NotImplementedError
+
+    def reset(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """Per-process store; holds at most `limit` timestamps for each of `max_keys` keys."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._windows: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window_seconds: float, now: float) -> float:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = deque(maxlen=limit)
+                self._windows[key] = window
+                while len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end(key)
+            while window and window[0] <= now - window_seconds:
+                window.popleft()
+            if len(window) >= limit:
+                return max(window[0] + window_seconds - now, 0.001)
+            window.append(now)
+            return 0.0
+
+    def reset(self, key: str):
+        with self._lock:
+            self._windows.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Host-wide store backed by a local SQLite file, shared by all worker processes.
+
+    Expired hits are purged for the key on every call and for the whole table every
+    `purge_every` calls, so the file only holds attempts from the current window.
+    """
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._calls = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rate_limit_hits (key TEXT NOT NULL, ts REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_hits_key_ts ON rate_limit_hits (key, ts)")
+
+    def hit(self, key: str, limit: int, window_seconds: float, now: float) -> float:
+        cutoff = now - window_seconds
+        with self._lock:
+            self._calls += 1
+            # BEGIN IMMEDIATE takes the write lock up front so concurrent workers serialize here.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._calls % self.purge_every == 0:
+                    self._conn.execute("DELETE FROM rate_limit_hits WHERE ts <= ?", (cutoff,))
+                else:
+                    self._conn.execute("DELETE FROM rate_limit_hits WHERE key = ? AND ts <= ?", (key, cutoff))
+                count, oldest = self._conn.execute(
+                    "SELECT count(*), min(ts) FROM rate_limit_hits WHERE key = ?", (key,)
+                ).fetchone()
+                if count >= limit:
+                    self._conn.execute("COMMIT")
+                    return max(oldest + window_seconds - now, 0.001)
+                self._conn.execute("INSERT INTO rate_limit_hits (key, ts) VALUES (?, ?)", (key, now))
+                self._conn.execute("COMMIT")
+                return 0.0
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def reset(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit_hits WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit_hits")
+
+
+class SlidingWindowRateLimiter:
+    """Allows at most `limit` hits per key within any `window_seconds` span."""
+
+    def __init__(self, store: RateLimitStore, window_seconds: float):
+        self.store = store
+        self.window_seconds = window_seconds
+
+    def hit(self, key: str, limit: int, now: Optional[float] = None) -> float:
+        """Record an attempt for `key`; return 0 if allowed, else the Retry-After delay in seconds."""
+        return self.store.hit(key, limit, self.window_seconds, time.time() if now is None else now)
+
+    def reset(self, key: str):
+        """Forget every hit recorded for `key`."""
+        self.store.reset(key)
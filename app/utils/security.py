@@ -1,19 +1,28 @@
 # app/security.py
-from builtins import Exception, ValueError, bool, int, str
+from builtins import Exception, RuntimeError, ValueError, bool, dict, float, int, max, str
+import asyncio
+import multiprocessing
 import secrets
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional
 import bcrypt
 from logging import getLogger
+from app.utils.metrics import Gauge, Histogram
+from settings.config import settings
 
 # Set up logging
 logger = getLogger(__name__)
 
-def hash_password(password: str, rounds: int = 12) -> str:
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
     """
     Hashes a password using bcrypt with a specified cost factor.
-    
+
     Args:
         password (str): The plain text password to hash.
-        rounds (int): The cost factor that determines the computational cost of hashing.
+        rounds (Optional[int]): The cost factor that determines the computational cost of hashing.
+            Defaults to `settings.bcrypt_rounds`.
 
     Returns:
         str: The hashed password.
@@ -22,7 +31,7 @@ def hash_password(password: str, rounds: int = 12) -> str:
         ValueError: If hashing the password fails.
     """
     try:
-        salt = bcrypt.gensalt(rounds=rounds)
+        salt = bcrypt.gensalt(rounds=rounds or settings.bcrypt_rounds)
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed_password.decode('utf-8')
     except Exception as e:
@@ -32,7 +41,7 @@ def hash_password(password: str, rounds: int = 12) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verifies a plain text password against a hashed password.
-    
+
     Args:
         plain_password (str): The plain text password to verify.
         hashed_password (str): The bcrypt hashed password.
@@ -49,5 +58,165 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         logger.error("Error verifying password: %s", e)
         raise ValueError("Authentication process encountered an unexpected error") from e
 
+def get_hash_rounds(hashed_password: str) -> Optional[int]:
+    """Return the cost factor encoded in a bcrypt hash such as `$2b$12$...`, or None if unparseable."""
+    parts = hashed_password.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def password_needs_rehash(hashed_password: str, rounds: Optional[int] = None) -> bool:
+    """Check whether a stored hash was made with a different cost than the configured one."""
+    return get_hash_rounds(hashed_password) != (rounds or settings.bcrypt_rounds)
+
 def generate_verification_token():
-    return secrets.token_urlsafe(16)  # Generates a secure 16-byte URL-safe token
\ No newline at end of file
+    return secrets.token_urlsafe(16)  # Generates a secure 16-byte URL-safe token
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many hash/verify calls are already queued for the worker pool."""
+
+
+class HashTimings:
+    """Running timing statistics for one kind of password operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.queue_seconds_total = 0.0
+        self.run_seconds_total = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, queue_seconds: float, run_seconds: float):
+        self.count += 1
+        self.queue_seconds_total += queue_seconds
+        self.run_seconds_total += run_seconds
+        self.max_seconds = max(self.max_seconds, queue_seconds + run_seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "queue_seconds_total": self.queue_seconds_total,
+            "run_seconds_total": self.run_seconds_total,
+            "max_seconds": self.max_seconds,
+        }
+
+
+hash_timings = {"hash": HashTimings(), "verify": HashTimings()}
+_executor: Optional[Executor] = None
+_pending = 0
+_slot_waiters: deque = deque()  # futures of bulk callers waiting for room in the queue
+
+password_queue_seconds = Histogram(
+    "password_hash_queue_seconds", "Time a bcrypt hash or verify waited for a worker.", ["operation"]
+)
+password_run_seconds = Histogram(
+    "password_hash_run_seconds", "Time a worker spent on a bcrypt hash or verify.", ["operation"]
+)
+password_pending = Gauge(
+    "password_hash_pending", "bcrypt hash and verify calls queued or running.", collect=lambda: {(): _pending}
+)
+
+def _get_executor() -> Optional[Executor]:
+    """Create the bcrypt worker pool on first use; None means the loop's default thread pool."""
+    global _executor
+    if _executor is None and settings.password_hash_workers > 0:
+        # The pool is created lazily, by then with threads running (SQL, tracing, loop watchdog);
+        # forking would copy their held locks into the workers, so start them from a forkserver.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.password_hash_workers, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return _executor
+
+def _timed_call(func, *args):
+    # Runs inside the worker; time.monotonic() is system-wide on Linux so the
+    # start time can be compared with the submit time taken in the parent.
+    started = time.monotonic()
+    result = func(*args)
+    return result, started, time.monotonic()
+
+async def _wait_for_slot():
+    loop = asyncio.get_running_loop()
+    while _pending >= settings.password_hash_max_pending:
+        waiter = loop.create_future()
+        _slot_waiters.append(waiter)
+        try:
+            await waiter
+        finally:
+            if waiter in _slot_waiters:
+                _slot_waiters.remove(waiter)
+
+def _release_slot():
+    global _pending
+    _pending -= 1
+    while _slot_waiters:
+        waiter = _slot_waiters.popleft()
+        if not waiter.done():
+            waiter.set_result(None)
+            break
+
+async def _run_in_pool(operation: str, func, *args, wait: bool = False):
+    """
+    :param wait: Wait for room when the queue is full instead of raising `PasswordHasherBusy`;
+        used by bulk callers that must not fail halfway because of a burst of logins.
+    """
+    global _pending
+    if wait:
+        await _wait_for_slot()
+    elif _pending >= settings.password_hash_max_pending:
+        raise PasswordHasherBusy("Password hashing queue is full")
+    _pending += 1
+    submitted = time.monotonic()
+    try:
+        loop = asyncio.get_running_loop()
+        result, started, finished = await loop.run_in_executor(_get_executor(), _timed_call, func, *args)
+    finally:
+        _release_slot()
+    hash_timings[operation].observe(started - submitted, finished - started)
+    password_queue_seconds.observe(started - submitted, operation=operation)
+    password_run_seconds.observe(finished - started, operation=operation)
+    return result
+
+async def hash_password_async(password: str, rounds: Optional[int] = None) -> str:
+    """
+    Hashes a password in the bcrypt worker pool so the event loop keeps serving other requests.
+
+    Raises:
+        ValueError: If hashing the password fails.
+        PasswordHasherBusy: If `password_hash_max_pending` calls are already outstanding.
+    """
+    # Resolve the cost here: worker processes do not see settings changed after they started.
+    return await _run_in_pool("hash", hash_password, password, rounds or settings.bcrypt_rounds)
+
+async def hash_passwords_async(passwords: List[str], concurrency: Optional[int] = None) -> List[str]:
+    """
+    Hashes many passwords in the bcrypt worker pool, in order, for bulk operations.
+
+    At most `concurrency` hashes are in flight (default: half of `password_hash_max_pending`),
+    so interactive logins and registrations still find room in the queue. When they fill it
+    anyway, bulk hashes wait for a free slot rather than raising `PasswordHasherBusy`.
+    """
+    limit = asyncio.Semaphore(concurrency or max(1, settings.password_hash_max_pending // 2))
+    rounds = settings.bcrypt_rounds
+
+    async def hash_one(password: str) -> str:
+        async with limit:
+            return await _run_in_pool("hash", hash_password, password, rounds, wait=True)
+
+    return await asyncio.gather(*(hash_one(password) for password in passwords))
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifies a password in the bcrypt worker pool so the event loop keeps serving other requests.
+
+    Raises:
+        ValueError: If the hashed password format is incorrect or the function fails to verify.
+        PasswordHasherBusy: If `password_hash_max_pending` calls are already outstanding.
+    """
+    return await _run_in_pool("verify", verify_password, plain_password, hashed_password)
+
+def shutdown_password_hasher():
+    """Stop the bcrypt worker pool; it is recreated on the next call."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
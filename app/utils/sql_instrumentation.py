@@ -0,0 +1,137 @@
+# sql_instrumentation.py
+"""
+Per-request SQL statistics gathered from SQLAlchemy engine events.
+
+`SQLInstrumentation` is attached to every engine by `Database.initialize`. While a request is
+being served by `SQLStatsMiddleware`, each statement is counted and timed into that request's
+`RequestSQLStats`, which is looked up through a context variable. Statements slower than the
+threshold are logged whether or not a request is active. At the end of the request the totals
+are logged, optionally returned as `Server-Timing`/`X-DB-*` headers, and any statement repeated
+`repeat_threshold` times is flagged as a likely N+1.
+"""
+from builtins import dict, float, int, list, round, str
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger(f"{__name__}.slow")
+
+_START_TIMES = "sql_instrumentation_start_times"  # Connection.info key, a stack for nested executes
+
+class RequestSQLStats:
+    """Statement count, database time and per-statement repeats for one request."""
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.repeats = Counter()
+
+    def observe(self, statement: str, seconds: float):
+        self.statements += 1
+        self.seconds += seconds
+        self.repeats[statement] += 1
+
+    @property
+    def milliseconds(self) -> float:
+        return round(self.seconds * 1000, 2)
+
+    def repeated(self, threshold: int):
+        """`(statement, count)` for statements run at least `threshold` times, most frequent first."""
+        return [(statement, count) for statement, count in self.repeats.most_common() if count >= threshold]
+
+_current_stats: ContextVar[Optional[RequestSQLStats]] = ContextVar("request_sql_stats", default=None)
+
+def current_sql_stats() -> Optional[RequestSQLStats]:
+    """Statistics of the request being served, or None outside one."""
+    return _current_stats.get()
+
+class SQLInstrumentation:
+    """Engine event listeners that feed `RequestSQLStats` and the slow-query log."""
+
+    def __init__(self, slow_query_ms: float = 200):
+        self.slow_query_seconds = slow_query_ms / 1000
+
+    def attach(self, sync_engine):
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self._handle_error)
+
+    def detach(self, sync_engine):
+        event.remove(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(sync_engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_START_TIMES, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info[_START_TIMES].pop()
+        self._record(statement, elapsed)
+
+    def _handle_error(self, exception_context):
+        start_times = exception_context.connection.info.get(_START_TIMES) if exception_context.connection else None
+        if start_times and exception_context.statement is not None:
+            self._record(exception_context.statement, time.perf_counter() - start_times.pop())
+
+    def _record(self, statement: str, seconds: float):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.observe(statement, seconds)
+        if seconds >= self.slow_query_seconds:
+            # Parameters are left out: they may hold emails, tokens or password hashes.
+            slow_query_logger.warning(
+                f"Slow query ({seconds * 1000:.1f} ms): {statement}",
+                extra={"db_ms": round(seconds * 1000, 2), "statement": statement},
+            )
+
+class SQLStatsMiddleware:
+    """
+    ASGI middleware that opens a `RequestSQLStats` per HTTP request and reports it.
+
+    Headers carry only what ran before the response started, so a streamed body's queries
+    appear in the log line but not in the headers.
+    """
+
+    def __init__(self, app, headers: bool = False, repeat_threshold: int = 5):
+        self.app = app
+        self.headers = headers
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestSQLStats()
+        token = _current_stats.set(stats)
+        status_code = None
+
+        async def send_with_stats(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.headers:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-query-count", str(stats.statements).encode()),
+                        (b"x-db-time-ms", str(stats.milliseconds).encode()),
+                        (b"server-timing", f"db;dur={stats.milliseconds};desc=\"{stats.statements} queries\"".encode()),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            self._report(scope, status_code, stats)
+
+    def _report(self, scope, status_code: Optional[int], stats: RequestSQLStats):
+        request = f"{scope['method']} {scope['path']}"
+        fields = {"db_statements": stats.statements, "db_ms": stats.milliseconds, "status_code": status_code}
+        logger.info(f"{request} -> {status_code}: {stats.statements} statements in {stats.milliseconds} ms", extra=fields)
+        for statement, count in stats.repeated(self.repeat_threshold):
+            logger.warning(
+                f"Possible N+1 in {request}: statement ran {count} times: {statement}",
+                extra=dict(fields, statement=statement, repeats=count),
+            )
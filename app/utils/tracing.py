@@ -0,0 +1,380 @@
+# tracing.py
+"""
+Lightweight request tracing: nested spans, pluggable exporters and trace IDs in logs.
+
+`TracingMiddleware` opens the root span of each request (continuing a W3C `traceparent`
+header when one is sent). Spans opened while it is active become its descendants through a
+context variable:
+
+- service methods via `trace_methods` or `traced`;
+- each SQL statement via `SQLTracing` engine listeners;
+- email and SMTP sends via `tracer.span`.
+
+When the root span ends, the whole trace is handed to every configured exporter. With no
+exporters, `tracer.span` is a no-op and nothing is recorded.
+
+`TraceContextFilter` adds `trace_id` and `span_id` to log records so they can be formatted
+into every line.
+"""
+from builtins import BaseException, Exception, NotImplementedError, bool, dict, float, int, isinstance, len, list, open, str, type
+import functools
+import inspect
+import json
+import logging
+import queue
+import re
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from app.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+class Span:
+    """One timed operation within a trace. `layer` is http, service, db, email or smtp."""
+
+    def __init__(self, name: str, layer: str, trace_id: str, parent_id: Optional[str], attributes: Optional[Dict] = None):
+        self.name = name
+        self.layer = layer
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._trace: List["Span"] = []  # shared by every span of the trace; exported with the root
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns is not None else None
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "layer": self.layer, "start_ns": self.start_ns, "end_ns": self.end_ns,
+            "duration_ms": self.duration_ms, "error": self.error, "attributes": self.attributes,
+        }
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+class Tracer:
+    def __init__(self):
+        self.exporters: List = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def start_span(
+        self, name: str, layer: str, attributes: Optional[Dict] = None,
+        parent: Optional[Span] = None, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+    ) -> Span:
+        """Start a span under `parent` (default: the current span); it is not made current."""
+        parent = parent or _current_span.get()
+        if parent is not None:
+            span = Span(name, layer, parent.trace_id, parent.span_id, attributes)
+            span._trace = parent._trace
+        else:
+            span = Span(name, layer, trace_id or secrets.token_hex(16), parent_id, attributes)
+        span._trace.append(span)
+        return span
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if span is span._trace[0]:
+            for exporter in self.exporters:
+                try:
+                    exporter.export(list(span._trace))
+                except Exception as e:
+                    logger.error(f"Trace exporter {type(exporter).__name__} failed: {e}")
+
+    @contextmanager
+    def span(self, name: str, layer: str = "internal", **attributes):
+        """Run the block in a child span of the current one; yields None when tracing is off."""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, layer, attributes)
+        token = _current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span, error)
+
+tracer = Tracer()
+
+def traced(name: Optional[str] = None, layer: str = "service"):
+    """Decorator running an async function in a span named `name` (default: its qualified name)."""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+            with tracer.span(span_name, layer):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def trace_methods(layer: str = "service"):
+    """Class decorator tracing every public async classmethod as `<Class>.<method>`."""
+    def decorate(cls):
+        for attr, value in list(vars(cls).items()):
+            if isinstance(value, classmethod) and not attr.startswith("_") and inspect.iscoroutinefunction(value.__func__):
+                setattr(cls, attr, classmethod(traced(f"{cls.__name__}.{attr}", layer)(value.__func__)))
+        return cls
+    return decorate
+
+class SQLTracing:
+    """Engine listeners recording each statement as a `db` span of the current trace."""
+
+    _SPANS = "tracing_spans"  # Connection.info key, a stack for nested executes
+
+    def attach(self, sync_engine):
+        event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self._handle_error)
+
+    def detach(self, sync_engine):
+        event.remove(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(sync_engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Statements outside a traced request do not start traces of their own.
+        span = None
+        if tracer.enabled and _current_span.get() is not None:
+            name = statement.split(None, 1)[0].upper() if statement.strip() else "SQL"
+            span = tracer.start_span(name, "db", {"db.system": conn.dialect.name, "db.statement": statement[:1000]})
+        conn.info.setdefault(self._SPANS, []).append(span)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        span = conn.info[self._SPANS].pop()
+        if span is not None:
+            tracer.end_span(span)
+
+    def _handle_error(self, exception_context):
+        spans = exception_context.connection.info.get(self._SPANS) if exception_context.connection else None
+        if spans and exception_context.statement is not None:
+            span = spans.pop()
+            if span is not None:
+                tracer.end_span(span, exception_context.original_exception)
+
+class TracingMiddleware:
+    """ASGI middleware opening the root `http` span of each request and returning its trace ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            return await self.app(scope, receive, send)
+        trace_id = parent_id = None
+        incoming = dict(scope.get("headers") or []).get(b"traceparent", b"").decode("latin-1")
+        match = TRACEPARENT.match(incoming)
+        if match:
+            trace_id, parent_id = match.groups()
+        span = tracer.start_span(
+            f"{scope['method']} {scope['path']}", "http",
+            {"http.method": scope["method"], "http.target": scope["path"]},
+            trace_id=trace_id, parent_id=parent_id,
+        )
+        token = _current_span.set(span)
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"traceparent", f"00-{span.trace_id}-{span.span_id}-01".encode()),
+                    (b"x-trace-id", span.trace_id.encode()),
+                ]
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                span.name = route.name
+                span.set_attribute("http.route", route.path)
+            _current_span.reset(token)
+            tracer.end_span(span, error)
+
+class TraceContextFilter(logging.Filter):
+    """Adds `trace_id` and `span_id` ("-" outside a trace) to every record it sees."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        record.trace_id = span.trace_id if span is not None else "-"
+        record.span_id = span.span_id if span is not None else "-"
+        return True
+
+class InMemoryExporter:
+    """Keeps exported spans in `spans`, for tests."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(spans)
+
+    def clear(self):
+        self.spans.clear()
+
+traces_dropped = Counter(
+    "traces_dropped_total", "Traces discarded because an exporter's queue was full.", ["exporter"]
+)
+
+class BackgroundExporter:
+    """
+    Writes traces from a single worker thread so exporting never blocks the event loop.
+
+    Finished traces wait in a bounded queue; when the backend falls behind and the queue is full,
+    new traces are dropped and counted in `traces_dropped_total` rather than piling up in memory.
+    The worker writes whatever has queued up in one batch of up to `max_batch_spans` spans.
+    """
+
+    def __init__(self, max_queue: int = 1000, max_batch_spans: int = 512):
+        self.max_batch_spans = max_batch_spans
+        self._queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=max_queue)
+        self._worker = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._worker.start()
+
+    def export(self, spans: List[Span]):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            traces_dropped.inc(exporter=type(self).__name__)
+
+    def _run(self):
+        while True:
+            traces = [self._queue.get()]
+            batch = list(traces[0])
+            while len(batch) < self.max_batch_spans:
+                try:
+                    traces.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                batch.extend(traces[-1])
+            self._write_logged(batch)
+            for _ in traces:
+                self._queue.task_done()
+
+    def _write_logged(self, spans: List[Span]):
+        try:
+            self._write(spans)
+        except Exception as e:
+            logger.error(f"{type(self).__name__} could not export {len(spans)} spans: {e}")
+
+    def _write(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def flush(self):
+        """Wait until everything exported so far has been written."""
+        self._queue.join()
+
+class JSONFileExporter(BackgroundExporter):
+    """Appends one JSON object per span to `path`."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _write(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as file:
+            for span in spans:
+                file.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+# OTLP span kinds: INTERNAL, SERVER, CLIENT.
+_OTLP_KINDS = {"http": 2, "db": 3, "smtp": 3}
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def otlp_payload(spans: List[Span], service_name: str) -> dict:
+    """An OTLP/HTTP JSON `ExportTraceServiceRequest` body for `spans`."""
+    otlp_spans = []
+    for span in spans:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": _OTLP_KINDS.get(span.layer, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in dict(span.attributes, layer=span.layer).items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        otlp_spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}],
+    }]}
+
+class OTLPHTTPExporter(BackgroundExporter):
+    """POSTs traces as OTLP/HTTP JSON to a collector, e.g. http://localhost:4318/v1/traces."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _write(self, spans: List[Span]):
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(otlp_payload(spans, self.service_name)).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+def build_exporters(settings) -> List:
+    """Exporters for `settings.tracing_exporter`: none, memory, jsonfile or otlp."""
+    if settings.tracing_exporter == "memory":
+        return [InMemoryExporter()]
+    if settings.tracing_exporter == "jsonfile":
+        return [JSONFileExporter(settings.tracing_json_path, max_queue=settings.tracing_export_queue_size)]
+    if settings.tracing_exporter == "otlp":
+        return [OTLPHTTPExporter(
+            settings.tracing_otlp_endpoint, settings.tracing_service_name, max_queue=settings.tracing_export_queue_size
+        )]
+    return []
@@ -0,0 +1,94 @@
+# login_round_trips.py
+"""
+Counts database round trips and wall time per login attempt, comparing the previous two-step
+flow (`is_account_locked` followed by `login_user`-style checks) with `UserService.authenticate`.
+
+Usage:
+    python -m benchmarks.login_round_trips [--attempts 20]
+
+Runs against `settings.database_url`; creates a throwaway user and deletes it afterwards.
+bcrypt time is excluded by hashing the benchmark password at the lowest cost.
+"""
+from builtins import int, print, range
+import argparse
+import asyncio
+import time
+import uuid
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models.user_model import User, UserRole
+from app.services.user_service import UserService
+from app.utils.security import hash_password
+from settings.config import settings
+
+PASSWORD = "Benchmark*1234"
+
+class RoundTripCounter:
+    """Counts statements plus BEGIN/COMMIT/ROLLBACK issued through an engine."""
+
+    def __init__(self, sync_engine):
+        self.count = 0
+        for name in ("before_cursor_execute", "begin", "commit", "rollback"):
+            event.listen(sync_engine, name, self._record)
+
+    def _record(self, *args, **kwargs):
+        self.count += 1
+
+async def two_step_login(session: AsyncSession, email: str, password: str):
+    # The route used to check the lock first, then run the login in a second lookup.
+    if await UserService.is_account_locked(session, email):
+        return None
+    return await UserService.login_user(session, email, password)
+
+async def single_step_login(session: AsyncSession, email: str, password: str):
+    user, _ = await UserService.authenticate(session, email, password)
+    return user
+
+async def measure(session_factory, counter: RoundTripCounter, login, email: str, password: str, attempts: int):
+    counter.count = 0
+    start = time.perf_counter()
+    for _ in range(attempts):
+        async with session_factory() as session:
+            await login(session, email, password)
+    elapsed = time.perf_counter() - start
+    return counter.count / attempts, elapsed / attempts * 1000
+
+async def main(attempts: int):
+    engine = create_async_engine(settings.database_url)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    email = f"bench-{uuid.uuid4().hex}@example.com"
+    async with session_factory() as session:
+        session.add(User(
+            nickname=f"bench_{uuid.uuid4().hex[:12]}", email=email, email_verified=True,
+            hashed_password=hash_password(PASSWORD, 4), role=UserRole.AUTHENTICATED,
+        ))
+        await session.commit()
+
+    counter = RoundTripCounter(engine.sync_engine)
+    original_rounds = settings.bcrypt_rounds
+    settings.bcrypt_rounds = 4  # keep the rehash check from firing
+    try:
+        print(f"{'flow':<12} {'outcome':<10} {'round trips':>12} {'ms/login':>10}")
+        # Failures are measured one at a time so the account never reaches the lock threshold.
+        for outcome, password, runs in (("success", PASSWORD, attempts), ("failure", "wrong-password", 1)):
+            for name, login in (("two-step", two_step_login), ("single-step", single_step_login)):
+                async with session_factory() as session:
+                    await UserService.authenticate(session, email, PASSWORD)  # resets failed attempts
+                trips, ms = await measure(session_factory, counter, login, email, password, runs)
+                print(f"{name:<12} {outcome:<10} {trips:>12.1f} {ms:>10.2f}")
+    finally:
+        settings.bcrypt_rounds = original_rounds
+        async with session_factory() as session:
+            await session.execute(delete(User).where(User.email == email))
+            await session.commit()
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--attempts", type=int, default=20)
+    asyncio.run(main(parser.parse_args().attempts))
@@ -0,0 +1,82 @@
+# user_listing.py
+"""
+Compares the ORM listing path (`UserService.list_users` + `UserResponse.model_validate`) with the
+column-projected path (`UserService.list_user_rows` + `UserResponse.model_construct`) per page.
+
+Usage:
+    python -m benchmarks.user_listing [--page-size 1000] [--repeats 20]
+
+Runs against `settings.database_url`; inserts `--page-size` throwaway users and deletes them
+afterwards. Reports median wall time and peak Python allocations (tracemalloc) per page.
+"""
+from builtins import int, len, print, range, sorted
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models.user_model import User, UserRole
+from app.schemas.user_schemas import UserResponse
+from app.services.user_service import UserService
+from settings.config import settings
+
+async def orm_page(session: AsyncSession, limit: int):
+    users = await UserService.list_users(session, 0, limit)
+    return [UserResponse.model_validate(user) for user in users]
+
+async def projected_page(session: AsyncSession, limit: int):
+    rows = await UserService.list_user_rows(session, 0, limit)
+    return [UserResponse.model_construct(**row._mapping) for row in rows]
+
+async def measure(session_factory, build_page, limit: int, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        async with session_factory() as session:  # fresh identity map, as per request
+            start = time.perf_counter()
+            page = await build_page(session, limit)
+            timings.append(time.perf_counter() - start)
+    async with session_factory() as session:
+        tracemalloc.start()
+        page = await build_page(session, limit)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return len(page), sorted(timings)[len(timings) // 2] * 1000, peak / 1024
+
+async def main(page_size: int, repeats: int):
+    engine = create_async_engine(settings.database_url)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    tag = uuid.uuid4().hex[:12]
+    async with session_factory() as session:
+        await session.execute(insert(User), [
+            {
+                "nickname": f"bench_{tag}_{i}", "email": f"bench-{tag}-{i}@example.com",
+                "bio": "x" * 300, "hashed_password": "$2b$04$" + "x" * 53, "role": UserRole.AUTHENTICATED,
+            }
+            for i in range(page_size)
+        ])
+        await session.commit()
+
+    try:
+        print(f"{'path':<10} {'rows':>6} {'median ms':>10} {'peak KiB':>10}")
+        for name, build_page in (("orm", orm_page), ("projected", projected_page)):
+            rows, ms, kib = await measure(session_factory, build_page, page_size, repeats)
+            print(f"{name:<10} {rows:>6} {ms:>10.2f} {kib:>10.0f}")
+    finally:
+        async with session_factory() as session:
+            await session.execute(delete(User).where(User.nickname.startswith(f"bench_{tag}_")))
+            await session.commit()
+        await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.page_size, args.repeats))
@@ -7,13 +7,14 @@ from unittest.mock import patch, AsyncMock
 import pytest
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, scoped_session
 from faker import Faker
 from app.main import app
 from app.database import Base, Database
 from app.models.user_model import User, UserRole
-from app.dependencies import get_db, get_settings, get_email_service
+from app.dependencies import get_db, get_login_rate_limiter, get_read_db, get_settings, get_email_service
 from app.utils.security import hash_password
 from app.utils.template_manager import TemplateManager
 from app.services.email_service import EmailService
@@ -44,6 +45,7 @@ def email_service(mock_smtp_client):
 async def async_client(db_session, email_service):
     async with AsyncClient(app=app, base_url="http://testserver") as client:
         app.dependency_overrides[get_db] = lambda: db_session
+        app.dependency_overrides[get_read_db] = lambda: db_session
         app.dependency_overrides[get_email_service] = lambda: email_service
         try:
             yield client
@@ -58,6 +60,12 @@ def initialize_database():
     except Exception as e:
         pytest.fail(f"Failed to initialize the database: {str(e)}")
 
+# Login throttle state is process-wide; start every test with a clean slate
+@pytest.fixture(scope="function", autouse=True)
+def reset_login_rate_limiter():
+    get_login_rate_limiter().store.clear()
+    yield
+
 # Setup and Teardown Database for Each Test
 @pytest.fixture(scope="function", autouse=True)
 async def setup_database():
@@ -77,6 +85,20 @@ async def db_session(setup_database):
         finally:
             await session.close()
 
+# Records every SQL statement sent through the test engine
+@pytest.fixture(scope="function")
+def sql_statements():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
 # User Fixtures
 @pytest.fixture(scope="function")
 async def locked_user(db_session):
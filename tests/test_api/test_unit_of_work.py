@@ -0,0 +1,107 @@
+# test_unit_of_work.py
+"""Statement and round-trip counts per endpoint with the real request-scoped sessions from get_db/get_read_db."""
+from builtins import len, sum
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from app.database import Database
+from app.dependencies import get_email_service
+from app.main import app
+
+class RoundTrips:
+    """Records statements and BEGIN/COMMIT/ROLLBACK issued through an engine."""
+
+    def __init__(self, sync_engine):
+        self.sync_engine = sync_engine
+        self.statements = []
+        self.transactions = {"begin": 0, "commit": 0, "rollback": 0}
+        self._listeners = [("before_cursor_execute", self._statement)]
+        self._listeners += [(name, self._transaction(name)) for name in self.transactions]
+        for name, listener in self._listeners:
+            event.listen(sync_engine, name, listener)
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def _transaction(self, name):
+        def record(conn):
+            self.transactions[name] += 1
+        return record
+
+    @property
+    def total(self):
+        return len(self.statements) + sum(self.transactions.values())
+
+    def remove(self):
+        for name, listener in self._listeners:
+            event.remove(self.sync_engine, name, listener)
+
+@pytest.fixture
+async def round_trips(email_service):
+    # Only the email service is overridden, so requests use the application's own sessions.
+    counter = RoundTrips(Database._engine.sync_engine)
+    app.dependency_overrides[get_email_service] = lambda: email_service
+    try:
+        async with AsyncClient(app=app, base_url="http://testserver") as client:
+            yield client, counter
+    finally:
+        app.dependency_overrides.clear()
+        counter.remove()
+        await Database._engine.dispose()  # connections are bound to this test's event loop
+
+@pytest.mark.asyncio
+async def test_get_user_round_trips(round_trips, admin_user, admin_token):
+    client, counter = round_trips
+    response = await client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    assert len(counter.statements) == 1
+    assert counter.transactions == {"begin": 1, "commit": 0, "rollback": 1}
+
+@pytest.mark.asyncio
+async def test_create_user_commits_once(round_trips, admin_token):
+    client, counter = round_trips
+    user_data = {"email": "uow@example.com", "password": "Secure*1234", "nickname": "uow_user"}
+    response = await client.post("/users/", json=user_data, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 201
+    # INSERT ... ON CONFLICT DO NOTHING RETURNING, no pre-check SELECTs
+    assert len(counter.statements) == 1
+    assert counter.transactions == {"begin": 1, "commit": 1, "rollback": 0}
+    assert counter.total == 3
+
+@pytest.mark.asyncio
+async def test_create_user_emails_after_commit(round_trips, admin_token, mock_smtp_client):
+    client, counter = round_trips
+    commits_at_send = []
+    mock_smtp_client.send_email.side_effect = lambda *args: commits_at_send.append(counter.transactions["commit"])
+    user_data = {"email": "after_commit@example.com", "password": "Secure*1234", "nickname": "after_commit"}
+    response = await client.post("/users/", json=user_data, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 201
+    assert commits_at_send == [1]
+
+@pytest.mark.asyncio
+async def test_update_user_commits_once(round_trips, admin_user, admin_token):
+    client, counter = round_trips
+    response = await client.put(
+        f"/users/{admin_user.id}", json={"bio": "unit of work"}, headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["bio"] == "unit of work"
+    assert len(counter.statements) == 1  # UPDATE ... RETURNING
+    assert counter.transactions == {"begin": 1, "commit": 1, "rollback": 0}
+
+@pytest.mark.asyncio
+async def test_delete_user_single_statement(round_trips, user, admin_token):
+    client, counter = round_trips
+    response = await client.delete(f"/users/{user.id}", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 204
+    assert len(counter.statements) == 1  # DELETE ... RETURNING
+    assert counter.transactions == {"begin": 1, "commit": 1, "rollback": 0}
+
+@pytest.mark.asyncio
+async def test_failed_request_rolls_back(round_trips, admin_token):
+    client, counter = round_trips
+    response = await client.delete(
+        "/users/00000000-0000-0000-0000-000000000000", headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 404
+    assert counter.transactions == {"begin": 1, "commit": 0, "rollback": 1}
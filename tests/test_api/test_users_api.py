@@ -1,12 +1,19 @@
 # test_users_api.py
-from builtins import str
+from builtins import all, range, str
+from uuid import uuid4
 import pytest
 from httpx import AsyncClient
+from starlette.requests import Request
+from app.database import Database
 from app.main import app
+from app.routers import user_routes
+from app.services import user_import_service
 from app.models.user_model import User
 from app.utils.nickname_gen import generate_nickname
 from app.utils.security import hash_password
 from app.services.jwt_service import decode_token  # Import your FastAPI app
+from app.dependencies import READ_YOUR_WRITES_COOKIE, get_read_db, get_settings
+from app.services.user_service import UserService
 
 # Example of a test function using the async_client fixture
 @pytest.mark.asyncio
@@ -52,6 +59,22 @@ async def test_update_user_email_access_allowed(async_client, admin_user, admin_
     assert response.status_code == 200
     assert response.json()["email"] == updated_data["email"]
 
+@pytest.mark.asyncio
+async def test_update_user_duplicate_email_or_nickname(async_client, admin_user, verified_user, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    admin_id, taken_email, taken_nickname = admin_user.id, verified_user.email, verified_user.nickname
+    response = await async_client.put(f"/users/{admin_id}", json={"email": taken_email.upper()}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already exists"
+    response = await async_client.put(f"/users/{admin_id}", json={"nickname": taken_nickname}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Nickname already exists"
+
+@pytest.mark.asyncio
+async def test_update_missing_user_not_found(async_client, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.put(f"/users/{uuid4()}", json={"bio": "nobody"}, headers=headers)
+    assert response.status_code == 404
 
 @pytest.mark.asyncio
 async def test_delete_user(async_client, admin_user, admin_token):
@@ -105,6 +128,12 @@ async def test_login_success(async_client, verified_user):
     assert decoded_token is not None, "Failed to decode token"
     assert decoded_token["role"] == "AUTHENTICATED", "The user role should be AUTHENTICATED"
 
+@pytest.mark.asyncio
+async def test_login_email_is_case_insensitive(async_client, verified_user):
+    form_data = {"username": verified_user.email.upper(), "password": "MySuperPassword$1234"}
+    response = await async_client.post("/login/", data=urlencode(form_data), headers={"Content-Type": "application/x-www-form-urlencoded"})
+    assert response.status_code == 200
+
 @pytest.mark.asyncio
 async def test_login_user_not_found(async_client):
     form_data = {
@@ -190,3 +219,227 @@ async def test_list_users_unauthorized(async_client, user_token):
         headers={"Authorization": f"Bearer {user_token}"}
     )
     assert response.status_code == 403  # Forbidden, as expected for regular user
+
+async def _login(async_client, user):
+    form_data = {"username": user.email, "password": "MySuperPassword$1234"}
+    response = await async_client.post("/login/", data=urlencode(form_data), headers={"Content-Type": "application/x-www-form-urlencoded"})
+    assert response.status_code == 200
+    return response.json()
+
+@pytest.mark.asyncio
+async def test_login_returns_refresh_token(async_client, verified_user):
+    data = await _login(async_client, verified_user)
+    assert data["refresh_token"]
+
+@pytest.mark.asyncio
+async def test_refresh_token_exchange(async_client, verified_user, mocker):
+    tokens = await _login(async_client, verified_user)
+    verify_spy = mocker.patch("app.services.user_service.verify_password_async")
+    response = await async_client.post("/token/refresh/", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["refresh_token"] != tokens["refresh_token"]
+    assert decode_token(data["access_token"])["sub"] == verified_user.email
+    verify_spy.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_refresh_token_is_single_use(async_client, verified_user):
+    tokens = await _login(async_client, verified_user)
+    first = await async_client.post("/token/refresh/", json={"refresh_token": tokens["refresh_token"]})
+    assert first.status_code == 200
+    second = await async_client.post("/token/refresh/", json={"refresh_token": tokens["refresh_token"]})
+    assert second.status_code == 401
+
+@pytest.mark.asyncio
+async def test_revoked_refresh_token_is_rejected(async_client, verified_user):
+    tokens = await _login(async_client, verified_user)
+    response = await async_client.post("/token/revoke/", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 204
+    response = await async_client.post("/token/refresh/", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_password_reset_revokes_refresh_tokens(async_client, db_session, verified_user):
+    tokens = await _login(async_client, verified_user)
+    assert await UserService.reset_password(db_session, verified_user.id, "NewSecure*1234")
+    response = await async_client.post("/token/refresh/", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_login_throttled_per_username(async_client, verified_user, mocker):
+    limit = get_settings().login_rate_limit_per_username
+    authenticate = mocker.spy(UserService, "authenticate")
+    form_data = {"username": verified_user.email, "password": "WrongPassword123!"}
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    for _ in range(limit):
+        await async_client.post("/login/", data=urlencode(form_data), headers=headers)
+    response = await async_client.post("/login/", data=urlencode(form_data), headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert authenticate.call_count == limit
+
+@pytest.mark.asyncio
+async def test_successful_login_does_not_use_username_budget(async_client, verified_user):
+    limit = get_settings().login_rate_limit_per_username
+    for _ in range(limit + 2):
+        await _login(async_client, verified_user)
+    form_data = {"username": verified_user.email, "password": "WrongPassword123!"}
+    response = await async_client.post("/login/", data=urlencode(form_data), headers={"Content-Type": "application/x-www-form-urlencoded"})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_login_throttled_per_forwarded_ip(async_client, monkeypatch):
+    monkeypatch.setenv("TRUSTED_PROXIES", '["127.0.0.1"]')
+    monkeypatch.setenv("LOGIN_RATE_LIMIT_PER_IP", "2")
+
+    async def login(username, forwarded_for):
+        return await async_client.post(
+            "/login/", data=urlencode({"username": username, "password": "WrongPassword123!"}),
+            headers={"Content-Type": "application/x-www-form-urlencoded", "X-Forwarded-For": forwarded_for},
+        )
+
+    for i in range(2):
+        await login(f"nobody{i}@example.com", "203.0.113.7")
+    assert (await login("nobody2@example.com", "203.0.113.7")).status_code == 429
+    # A different client behind the same proxy has its own bucket; a spoofed leftmost hop is ignored.
+    assert (await login("nobody3@example.com", "198.51.100.1, 203.0.113.9")).status_code == 401
+    assert (await login("nobody4@example.com", "203.0.113.7, 203.0.113.9")).status_code == 401
+
+@pytest.mark.asyncio
+async def test_write_pins_reads_to_primary_when_replicas_configured(async_client, admin_user, admin_token, mocker):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.put(f"/users/{admin_user.id}", json={"bio": "no replicas"}, headers=headers)
+    assert READ_YOUR_WRITES_COOKIE not in response.cookies
+
+    mocker.patch.object(Database, "has_replicas", return_value=True)
+    response = await async_client.put(f"/users/{admin_user.id}", json={"bio": "with replicas"}, headers=headers)
+    assert response.status_code == 200
+    assert response.cookies[READ_YOUR_WRITES_COOKIE] == "1"
+
+@pytest.mark.asyncio
+async def test_get_read_db_honours_read_your_writes_cookie(mocker):
+    primary = mocker.patch.object(Database, "get_session_factory")
+    replica = mocker.patch.object(Database, "get_read_session_factory")
+    for cookie, expected in ((b"", replica), (f"{READ_YOUR_WRITES_COOKIE}=1".encode(), primary)):
+        request = Request({"type": "http", "headers": [(b"cookie", cookie)]})
+        session_gen = get_read_db(request)
+        await session_gen.__anext__()
+        await session_gen.aclose()
+        assert expected.call_count == 1
+
+@pytest.mark.asyncio
+async def test_import_users_queues_verification_emails(async_client, admin_token, email_service, mocker):
+    send = mocker.spy(email_service, "send_verification_email")
+    content = b'{"email": "import1@example.com", "password": "Secure*1234"}\n{"email": "bad"}\n'
+    response = await async_client.post(
+        "/users/import/",
+        files={"file": ("cohort.jsonl", content, "application/x-ndjson")},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 1
+    assert report["failed"] == 1
+    assert report["errors"][0]["row"] == 2
+    assert send.call_count == 1
+
+@pytest.mark.asyncio
+async def test_import_users_reports_invalid_utf8_after_partial_load(async_client, admin_token, email_service, mocker, monkeypatch):
+    monkeypatch.setattr(user_import_service.settings, "user_import_chunk_size", 1)
+    send = mocker.spy(email_service, "send_verification_email")
+    content = b'{"email": "utf8a@example.com", "password": "Secure*1234"}\n' \
+              b'{"email": "utf8b@example.com", "password": "Secure*1234"}\n' \
+              b'{"email": "caf\xe9@example.com", "password": "Secure*1234"}\n'
+    response = await async_client.post(
+        "/users/import/",
+        files={"file": ("cohort.jsonl", content, "application/x-ndjson")},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["failed"]) == (2, 1)
+    assert report["errors"][0]["row"] == 3
+    assert "UTF-8" in report["errors"][0]["errors"][0]
+    assert send.call_count == 2
+
+@pytest.mark.asyncio
+async def test_import_users_requires_admin_or_manager(async_client, user_token):
+    response = await async_client.post(
+        "/users/import/", files={"file": ("cohort.csv", b"email,password\n", "text/csv")},
+        headers={"Authorization": f"Bearer {user_token}"},
+    )
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_export_users_streams_ndjson(async_client, admin_user, admin_token):
+    try:
+        response = await async_client.get("/users/export/", headers={"Authorization": f"Bearer {admin_token}"})
+    finally:
+        await Database._engine.dispose()  # the export opens its own session on the app engine
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert admin_user.email in response.text
+
+@pytest.mark.asyncio
+async def test_export_users_admin_only(async_client, manager_token):
+    response = await async_client.get("/users/export/?format=csv", headers={"Authorization": f"Bearer {manager_token}"})
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_batch_get_users_in_request_order(async_client, user, admin_user, admin_token):
+    missing_id = "00000000-0000-0000-0000-000000000000"
+    ids = [str(admin_user.id), missing_id, str(user.id)]
+    response = await async_client.post(
+        "/users/batch-get/", json={"ids": ids}, headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["id"] for item in body["items"]] == ids
+    assert [item["found"] for item in body["items"]] == [True, False, True]
+    assert body["items"][0]["user"]["email"] == admin_user.email
+    assert body["items"][1]["user"] is None
+    assert body["missing"] == [missing_id]
+
+@pytest.mark.asyncio
+async def test_batch_get_users_rejects_too_many_ids(async_client, admin_token, monkeypatch):
+    monkeypatch.setattr(user_routes.settings, "user_batch_get_max_ids", 2)
+    ids = [str(uuid4()) for _ in range(3)]
+    response = await async_client.post(
+        "/users/batch-get/", json={"ids": ids}, headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_list_users_filters_and_search(async_client, admin_user, manager_user, user, admin_token):
+    response = await async_client.get(
+        "/users/", params={"role": "MANAGER", "limit": 5}, headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["id"] for item in body["items"]] == [str(manager_user.id)]
+    assert body["total"] == 1
+    assert all("role=MANAGER" in link["href"] for link in body["links"])
+
+    response = await async_client.get(
+        "/users/", params={"search": user.email.upper()}, headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert [item["id"] for item in response.json()["items"]] == [str(user.id)]
+
+@pytest.mark.asyncio
+async def test_list_users_rejects_invalid_filter(async_client, admin_token):
+    response = await async_client.get("/users/?role=OWNER", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(async_client, admin_user, admin_token):
+    await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {admin_token}"})
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_request_duration_seconds_count{route="get_user",method="GET"}' in body
+    assert 'http_requests_total{route="get_user",method="GET",status="200"}' in body
+    assert "http_requests_in_flight 1.0" in body  # the scrape itself
+    assert 'db_pool_size{pool="primary"}' in body
+    assert "# TYPE password_hash_run_seconds histogram" in body
+    assert "# TYPE emails_sent_total counter" in body
@@ -0,0 +1,25 @@
+# test_calibrate_bcrypt.py
+from app.cli.calibrate_bcrypt import calibrate_rounds, main
+
+def fake_measure(rounds):
+    # 1 ms at cost 4, doubling per round like bcrypt
+    return 0.001 * 2 ** (rounds - 4)
+
+def test_calibrate_rounds_picks_highest_within_budget():
+    # cost 10 -> 64 ms, cost 11 -> 128 ms, cost 12 -> 256 ms
+    assert calibrate_rounds(200, min_rounds=4, max_rounds=16, measure=fake_measure) == 11
+
+def test_calibrate_rounds_stops_measuring_after_budget_exceeded():
+    report = []
+    calibrate_rounds(200, min_rounds=10, max_rounds=16, measure=fake_measure, report=report)
+    assert [rounds for rounds, _ in report] == [10, 11, 12]
+
+def test_calibrate_rounds_never_goes_below_minimum():
+    assert calibrate_rounds(1, min_rounds=10, measure=fake_measure) == 10
+
+def test_calibrate_rounds_respects_maximum():
+    assert calibrate_rounds(10_000_000, min_rounds=4, max_rounds=8, measure=fake_measure) == 8
+
+def test_main_prints_env_line(capsys):
+    assert main(["--target-ms", "100000", "--min-rounds", "4", "--max-rounds", "5", "--samples", "1"]) == 0
+    assert "BCRYPT_ROUNDS=5" in capsys.readouterr().out
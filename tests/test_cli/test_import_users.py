@@ -0,0 +1,10 @@
+# test_import_users.py
+from app.cli.import_users import main
+
+def test_main_imports_file_and_reports_failures(tmp_path, capsys):
+    path = tmp_path / "cohort.csv"
+    path.write_text("email,password\ncli1@example.com,Secure*1234\ncli1@example.com,Secure*1234\n")
+    assert main([str(path)]) == 1
+    out = capsys.readouterr().out
+    assert "line 3: cli1@example.com: Email already exists" in out
+    assert "created=1 failed=1" in out
@@ -1,5 +1,6 @@
+import threading
 import pytest
-from app.services.email_service import EmailService
+from app.services.email_service import EmailService, email_send_failures, emails_sent
 from app.utils.template_manager import TemplateManager
 
     
@@ -12,3 +13,23 @@ async def test_send_markdown_email(email_service):
     }
     await email_service.send_user_email(user_data, 'email_verification')
     # Manual verification in Mailtrap
+
+@pytest.mark.asyncio
+async def test_send_email_counts_outcomes(email_service, mock_smtp_client):
+    user_data = {"email": "test@example.com", "name": "Test User", "verification_url": "http://example.com/verify"}
+    sent = emails_sent.value(email_type="email_verification")
+    failed = email_send_failures.value(email_type="email_verification")
+    await email_service.send_user_email(user_data, 'email_verification')
+    mock_smtp_client.send_email.side_effect = OSError("connection refused")
+    with pytest.raises(OSError):
+        await email_service.send_user_email(user_data, 'email_verification')
+    assert emails_sent.value(email_type="email_verification") == sent + 1
+    assert email_send_failures.value(email_type="email_verification") == failed + 1
+
+@pytest.mark.asyncio
+async def test_send_email_runs_smtp_off_event_loop(email_service, mock_smtp_client):
+    user_data = {"email": "test@example.com", "name": "Test User", "verification_url": "http://example.com/verify"}
+    threads = []
+    mock_smtp_client.send_email.side_effect = lambda *args: threads.append(threading.get_ident())
+    await email_service.send_user_email(user_data, 'email_verification')
+    assert threads and threads[0] != threading.get_ident()
@@ -6,7 +6,7 @@ from uuid import uuid4
 import pytest
 from fastapi import Request
 
-from app.utils.link_generation import create_link, create_pagination_link, create_user_links, generate_pagination_links
+from app.utils.link_generation import create_link, create_pagination_link, create_user_links, generate_cursor_pagination_links, generate_pagination_links
 
 from urllib.parse import urlparse, parse_qs, urlunparse, urlencode
 
@@ -49,3 +49,17 @@ def test_generate_pagination_links(mock_request):
     assert len(links) >= 4
     expected_self_url = "http://testserver/users?limit=5&skip=10"
     assert normalize_url(str(links[0].href)) == normalize_url(expected_self_url), "Self link should match expected URL"
+
+def test_generate_cursor_pagination_links(mock_request):
+    links = generate_cursor_pagination_links(mock_request, 5, None, "next-token", None)
+    rels = {link.rel: normalize_url(str(link.href)) for link in links}
+    assert set(rels) == {"self", "first", "next"}
+    assert rels["next"] == normalize_url("http://testserver/users?pagination=cursor&limit=5&cursor=next-token")
+
+def test_pagination_links_carry_filters(mock_request):
+    links = generate_pagination_links(mock_request, 0, 5, 50, {"role": "ADMIN", "search": "doe"})
+    assert normalize_url(str(links[0].href)) == normalize_url("http://testserver/users?skip=0&limit=5&role=ADMIN&search=doe")
+    links = generate_cursor_pagination_links(mock_request, 5, None, "next-token", None, {"is_locked": True})
+    assert normalize_url(str(links[-1].href)) == normalize_url(
+        "http://testserver/users?pagination=cursor&limit=5&is_locked=True&cursor=next-token"
+    )
@@ -123,6 +123,11 @@ async def test_create_user_existing_email(async_client: AsyncClient, admin_token
     response = await async_client.post("/users/", json=user_data, headers={"Authorization": f"Bearer {admin_token}"})
     assert response.status_code == 400
 
+    user_data.update(email="other@example.com", nickname="testuser")
+    response = await async_client.post("/users/", json=user_data, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Nickname already exists"
+
 @pytest.mark.asyncio
 async def test_update_user_not_found(async_client: AsyncClient, admin_token: str):
     user_update_data = {
@@ -164,3 +169,32 @@ async def test_list_users_with_pagination(async_client: AsyncClient, admin_token
     data = response.json()
     assert len(data["items"]) == 10
     assert data["total"] == existing_user_count + 15
+    assert data["total_is_exact"] is True
+
+@pytest.mark.asyncio
+async def test_list_users_with_cursor_pagination(async_client: AsyncClient, admin_token: str, db_session: AsyncSession):
+    for i in range(15):
+        db_session.add(User(
+            nickname=f"cursoruser{i}",
+            email=f"cursoruser{i}@example.com",
+            hashed_password="not-a-real-hash",
+            role=UserRole.AUTHENTICATED
+        ))
+    await db_session.commit()
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    response = await async_client.get("/users/?pagination=cursor&limit=10", headers=headers)
+    assert response.status_code == 200
+    first_page = response.json()
+    assert first_page["page"] is None
+    links = {link["rel"]: link["href"] for link in first_page["links"]}
+    assert "prev" not in links
+
+    response = await async_client.get(links["next"], headers=headers)
+    second_page = response.json()
+    first_ids = {item["id"] for item in first_page["items"]}
+    assert second_page["items"] and not first_ids & {item["id"] for item in second_page["items"]}
+    assert "prev" in {link["rel"] for link in second_page["links"]}
+
+    response = await async_client.get("/users/?cursor=garbage", headers=headers)
+    assert response.status_code == 400
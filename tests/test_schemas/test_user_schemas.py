@@ -73,3 +73,8 @@ def test_user_base_invalid_email(user_base_data_invalid):
     
     assert "value is not a valid email address" in str(exc_info.value)
     assert "john.doe.example.com" in str(exc_info.value)
+
+def test_email_normalized_to_lowercase(user_create_data):
+    user_create_data["email"] = "John.Doe@Example.COM"
+    assert UserCreate(**user_create_data).email == "john.doe@example.com"
+    assert UserUpdate(email="John.Doe@Example.COM").email == "john.doe@example.com"
@@ -1,7 +1,12 @@
 # test_security.py
 from builtins import RuntimeError, ValueError, isinstance, str
 import pytest
-from app.utils.security import hash_password, verify_password
+from app.utils import security
+from app.utils.security import (
+    PasswordHasherBusy, get_hash_rounds, hash_password, hash_password_async, hash_timings, password_needs_rehash,
+    verify_password, verify_password_async
+)
+from settings.config import settings
 
 def test_hash_password():
     """Test that hashing password returns a bcrypt hashed string."""
@@ -20,6 +25,24 @@ def test_hash_password_with_different_rounds():
     hashed_12 = hash_password(password, rounds)
     assert hashed_10 != hashed_12, "Hashes should differ with different cost factors"
 
+def test_hash_password_uses_configured_rounds(monkeypatch):
+    """Test that the default cost comes from settings."""
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    assert hash_password("secure_password").startswith('$2b$05$')
+
+def test_get_hash_rounds():
+    """Test reading the cost factor back out of a hash."""
+    assert get_hash_rounds(hash_password("secure_password", 4)) == 4
+    assert get_hash_rounds("invalid_hash_format") is None
+
+def test_password_needs_rehash(monkeypatch):
+    """Test that a hash needs rehashing only when its cost differs from the configured one."""
+    hashed = hash_password("secure_password", 4)
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    assert password_needs_rehash(hashed) is False
+    monkeypatch.setattr(settings, "bcrypt_rounds", 5)
+    assert password_needs_rehash(hashed) is True
+
 def test_verify_password_correct():
     """Test verifying the correct password."""
     password = "secure_password"
@@ -65,3 +88,37 @@ def test_hash_password_internal_error(monkeypatch):
     with pytest.raises(ValueError):
         hash_password("test")
 
+async def test_hash_and_verify_password_async():
+    """Test that the worker pool hashes and verifies like the synchronous helpers."""
+    hashed = await hash_password_async("secure_password", rounds=4)
+    assert hashed.startswith('$2b$04$')
+    assert await verify_password_async("secure_password", hashed) is True
+    assert await verify_password_async("incorrect_password", hashed) is False
+
+async def test_verify_password_async_invalid_hash():
+    """Test that worker errors surface as ValueError in the caller."""
+    with pytest.raises(ValueError):
+        await verify_password_async("secure_password", "invalid_hash_format")
+
+async def test_password_async_records_timings():
+    """Test that each pooled call is counted in the timing metrics."""
+    before = hash_timings["hash"].count
+    await hash_password_async("secure_password", rounds=4)
+    snapshot = hash_timings["hash"].snapshot()
+    assert snapshot["count"] == before + 1
+    assert snapshot["run_seconds_total"] > 0
+
+async def test_password_async_rejects_when_queue_full(monkeypatch):
+    """Test that calls beyond the pending limit are rejected instead of queued."""
+    monkeypatch.setattr(settings, "password_hash_max_pending", 0)
+    with pytest.raises(PasswordHasherBusy):
+        await hash_password_async("secure_password", rounds=4)
+    assert security._pending == 0
+
+async def test_password_async_thread_pool_mode(monkeypatch):
+    """Test that a worker count of zero falls back to the loop's thread pool."""
+    security.shutdown_password_hasher()
+    monkeypatch.setattr(settings, "password_hash_workers", 0)
+    hashed = await hash_password_async("secure_password", rounds=4)
+    assert security._executor is None
+    assert await verify_password_async("secure_password", hashed) is True
@@ -0,0 +1,79 @@
+# test_jwt_service.py
+import time
+from datetime import timedelta
+import pytest
+from app.services import jwt_service
+from app.services.jwt_service import VerifiedTokenCache, create_access_token, decode_token_cached, token_cache
+from app.utils.metrics import REGISTRY
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+def test_decode_token_cached_verifies_once(monkeypatch):
+    token = create_access_token(data={"sub": "john@example.com", "role": "admin"})
+    calls = []
+    original_decode = jwt_service.decode_token
+    monkeypatch.setattr(jwt_service, "decode_token", lambda t: calls.append(t) or original_decode(t))
+
+    first = decode_token_cached(token)
+    second = decode_token_cached(token)
+    assert first == second
+    assert second["role"] == "ADMIN"
+    assert len(calls) == 1
+    assert token_cache.stats()["hits"] == 1
+    assert token_cache.stats()["misses"] == 1
+
+def test_token_cache_stats_exported_as_metrics():
+    token = create_access_token(data={"sub": "john@example.com", "role": "admin"})
+    decode_token_cached(token)
+    decode_token_cached(token)
+    body = REGISTRY.render()
+    assert "jwt_cache_hits_total 1.0" in body
+    assert "jwt_cache_misses_total 1.0" in body
+    assert "jwt_cache_evictions_total 0.0" in body
+    assert "jwt_cache_size 1.0" in body
+    assert "# TYPE jwt_cache_max_size gauge" in body
+
+def test_decode_token_cached_does_not_cache_invalid_tokens():
+    assert decode_token_cached("not-a-token") is None
+    assert decode_token_cached("not-a-token") is None
+    assert token_cache.stats()["size"] == 0
+    assert token_cache.stats()["misses"] == 2
+
+def test_cached_entry_expires_with_token():
+    cache = VerifiedTokenCache(max_size=10)
+    cache.put("token", {"sub": "john@example.com", "exp": time.time() - 1})
+    assert cache.get("token") is None
+    assert cache.stats()["size"] == 0
+
+def test_cache_without_exp_is_not_stored():
+    cache = VerifiedTokenCache(max_size=10)
+    cache.put("token", {"sub": "john@example.com"})
+    assert cache.get("token") is None
+
+def test_cache_evicts_least_recently_used():
+    cache = VerifiedTokenCache(max_size=2)
+    expires_at = time.time() + 60
+    cache.put("a", {"sub": "a", "exp": expires_at})
+    cache.put("b", {"sub": "b", "exp": expires_at})
+    cache.get("a")
+    cache.put("c", {"sub": "c", "exp": expires_at})
+    assert cache.get("b") is None
+    assert cache.get("a")["sub"] == "a"
+    assert cache.get("c")["sub"] == "c"
+    assert cache.stats()["evictions"] == 1
+
+def test_expired_token_is_rejected_even_if_previously_cached():
+    token = create_access_token(data={"sub": "john@example.com", "role": "ADMIN"}, expires_delta=timedelta(seconds=-1))
+    assert decode_token_cached(token) is None
+
+async def test_protected_route_uses_cache(async_client, admin_user, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    for _ in range(3):
+        response = await async_client.get(f"/users/{admin_user.id}", headers=headers)
+        assert response.status_code == 200
+    assert token_cache.stats()["misses"] == 1
+    assert token_cache.stats()["hits"] == 2
@@ -0,0 +1,60 @@
+# test_refresh_token_service.py
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select, update
+from app.models.refresh_token_model import RefreshToken
+from app.services.refresh_token_service import RefreshTokenService
+
+pytestmark = pytest.mark.asyncio
+
+async def test_issue_stores_only_digest(db_session, verified_user):
+    token = await RefreshTokenService.issue(db_session, verified_user.id)
+    stored = (await db_session.execute(select(RefreshToken))).scalars().all()
+    assert len(stored) == 1
+    assert stored[0].token_hash != token
+    assert stored[0].token_hash == RefreshTokenService._digest(token)
+
+async def test_rotate_returns_user_and_new_token(db_session, verified_user):
+    token = await RefreshTokenService.issue(db_session, verified_user.id)
+    rotated = await RefreshTokenService.rotate(db_session, token)
+    assert rotated is not None
+    user, new_token = rotated
+    assert user.id == verified_user.id
+    assert new_token != token
+
+async def test_rotated_token_cannot_be_reused(db_session, verified_user):
+    token = await RefreshTokenService.issue(db_session, verified_user.id)
+    _, new_token = await RefreshTokenService.rotate(db_session, token)
+    assert await RefreshTokenService.rotate(db_session, token) is None
+    # Reuse of the old token revokes the replacement too
+    assert await RefreshTokenService.rotate(db_session, new_token) is None
+
+async def test_rotate_unknown_token(db_session):
+    assert await RefreshTokenService.rotate(db_session, "unknown-token") is None
+
+async def test_rotate_expired_token(db_session, verified_user):
+    token = await RefreshTokenService.issue(db_session, verified_user.id)
+    await db_session.execute(
+        update(RefreshToken).values(expires_at=datetime.now(timezone.utc) - timedelta(minutes=1))
+    )
+    await db_session.commit()
+    assert await RefreshTokenService.rotate(db_session, token) is None
+
+async def test_rotate_rejects_locked_user(db_session, verified_user):
+    token = await RefreshTokenService.issue(db_session, verified_user.id)
+    verified_user.is_locked = True
+    await db_session.commit()
+    assert await RefreshTokenService.rotate(db_session, token) is None
+
+async def test_revoke(db_session, verified_user):
+    token = await RefreshTokenService.issue(db_session, verified_user.id)
+    assert await RefreshTokenService.revoke(db_session, token) is True
+    assert await RefreshTokenService.revoke(db_session, token) is False
+    assert await RefreshTokenService.rotate(db_session, token) is None
+
+async def test_revoke_all_for_user(db_session, verified_user):
+    first = await RefreshTokenService.issue(db_session, verified_user.id)
+    second = await RefreshTokenService.issue(db_session, verified_user.id)
+    assert await RefreshTokenService.revoke_all_for_user(db_session, verified_user.id) == 2
+    assert await RefreshTokenService.rotate(db_session, first) is None
+    assert await RefreshTokenService.rotate(db_session, second) is None
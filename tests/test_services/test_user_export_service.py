@@ -0,0 +1,21 @@
+import csv
+import json
+import pytest
+from app.services.user_export_service import EXPORT_FIELDS, UserExportService
+
+pytestmark = pytest.mark.asyncio
+
+async def test_stream_ndjson_in_batches(db_session, users_with_same_role_50_users):
+    chunks = [chunk async for chunk in UserExportService.stream(db_session, "ndjson", batch_size=20)]
+    assert [chunk.count("\n") for chunk in chunks] == [20, 20, 10]
+    records = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert {record["email"] for record in records} == {user.email for user in users_with_same_role_50_users}
+    assert records[0]["role"] == "AUTHENTICATED"
+    assert "hashed_password" not in records[0] and "verification_token" not in records[0]
+
+async def test_stream_csv_starts_with_header(db_session, users_with_same_role_50_users):
+    chunks = [chunk async for chunk in UserExportService.stream(db_session, "csv", batch_size=20)]
+    assert len(chunks) == 4
+    rows = list(csv.reader("".join(chunks).splitlines()))
+    assert rows[0] == EXPORT_FIELDS
+    assert len(rows) == 51
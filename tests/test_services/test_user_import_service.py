@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from app.models.user_model import User
+from app.services.user_import_service import UserImportService, iter_import_rows
+from app.utils import security
+from settings.config import settings
+
+pytestmark = pytest.mark.asyncio
+
+CSV = """email,password,nickname,first_name
+ada@example.com,Secure*1234,,Ada
+not-an-email,Secure*1234,,Bad
+{existing},Secure*1234,,Taken
+ada@example.com,Secure*1234,,Again
+grace@example.com,Secure*1234,{existing_nickname},Grace
+linus@example.com,Secure*1234,linus_t,Linus
+"""
+
+async def test_import_rows_reports_per_row_errors(db_session, user, sql_statements):
+    lines = CSV.format(existing=user.email, existing_nickname=user.nickname).splitlines(keepends=True)
+    created = []
+    report = await UserImportService.import_rows(db_session, iter_import_rows(lines, "csv"), on_created=created.extend)
+
+    assert report.created == 2
+    assert report.failed == 4
+    assert [(error.row, error.errors[0].split(":")[0]) for error in report.errors] == [
+        (3, "email"),
+        (4, "Email already exists"),
+        (5, "Email already exists"),
+        (6, "Nickname already exists"),
+    ]
+    assert sorted(row.email for row in created) == ["ada@example.com", "linus@example.com"]
+    inserts = [statement for statement in sql_statements if statement.startswith("INSERT INTO users")]
+    assert len(inserts) == 1
+    result = await db_session.execute(select(User).where(User.email == "linus@example.com"))
+    imported = result.scalars().one()
+    assert imported.nickname == "linus_t"
+    assert imported.verification_token and imported.hashed_password.startswith("$2b$")
+
+async def test_import_rows_in_chunks(db_session, sql_statements):
+    lines = [f'{{"email": "user{i}@example.com", "password": "Secure*1234"}}\n' for i in range(7)]
+    report = await UserImportService.import_rows(db_session, iter_import_rows(lines, "jsonl"), chunk_size=3)
+    assert report.created == 7 and report.failed == 0
+    assert len([statement for statement in sql_statements if statement.startswith("INSERT INTO users")]) == 3
+
+async def test_import_rows_reports_bad_json(db_session):
+    lines = ['{"email": "ok@example.com", "password": "Secure*1234"}\n', "{not json\n", "\n", "[1, 2]\n"]
+    report = await UserImportService.import_rows(db_session, iter_import_rows(lines, "jsonl"))
+    assert report.created == 1
+    assert [error.row for error in report.errors] == [2, 4]
+    assert report.errors[0].errors[0].startswith("Invalid JSON")
+
+async def test_iter_import_rows_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        list(iter_import_rows([], "xml"))
+
+async def test_import_waits_for_full_hash_queue(db_session, monkeypatch):
+    """A hash queue filled by logins delays the import instead of failing it partway."""
+    monkeypatch.setattr(settings, "password_hash_max_pending", 2)
+    monkeypatch.setattr(security, "_pending", 2)
+    lines = [f'{{"email": "queued{i}@example.com", "password": "Secure*1234"}}\n' for i in range(3)]
+    task = asyncio.create_task(UserImportService.import_rows(db_session, iter_import_rows(lines, "jsonl"), chunk_size=2))
+    await asyncio.sleep(0.1)
+    assert not task.done()
+    for _ in range(2):
+        security._release_slot()  # the logins finish
+    report = await task
+    assert (report.created, report.failed) == (3, 0)
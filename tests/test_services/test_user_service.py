@@ -1,10 +1,15 @@
 # test_user_service
-from builtins import range
+from builtins import all, len, range
+from uuid import uuid4
 import pytest
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from app.dependencies import get_settings
-from app.models.user_model import User
-from app.services.user_service import UserService
+from app.models.user_count_model import set_user_counter_enabled
+from app.models.user_model import User, UserRole
+from app.schemas.user_schemas import UserFilter
+from app.services.user_service import DuplicateUserError, UserService
+from app.utils.security import get_hash_rounds, verify_password
+from settings.config import settings
 
 pytestmark = pytest.mark.asyncio
 
@@ -18,6 +23,39 @@ async def test_create_user_with_valid_data(db_session, email_service):
     assert user is not None
     assert user.email == user_data["email"]
 
+async def test_create_user_duplicate_email_raises(db_session, email_service, user):
+    with pytest.raises(DuplicateUserError, match="Email already exists"):
+        await UserService.create(db_session, {"email": user.email, "password": "ValidPassword123!"}, email_service)
+
+async def test_create_user_email_is_case_insensitive(db_session, email_service, user):
+    with pytest.raises(DuplicateUserError, match="Email already exists"):
+        await UserService.create(db_session, {"email": user.email.upper(), "password": "ValidPassword123!"}, email_service)
+    created = await UserService.create(db_session, {"email": "New.Person@Example.COM", "password": "ValidPassword123!"}, email_service)
+    assert created.email == "new.person@example.com"
+
+async def test_create_user_duplicate_requested_nickname_raises(db_session, email_service, user):
+    user_data = {"email": "other@example.com", "password": "ValidPassword123!", "nickname": user.nickname}
+    with pytest.raises(DuplicateUserError, match="Nickname already exists"):
+        await UserService.create(db_session, user_data, email_service)
+
+async def test_create_user_replaces_colliding_generated_nickname(db_session, email_service, user, monkeypatch):
+    monkeypatch.setattr("app.services.user_service.generate_nickname", lambda digits: user.nickname)
+    new_user = await UserService.create(db_session, {"email": "other@example.com", "password": "ValidPassword123!"}, email_service)
+    assert new_user.nickname != user.nickname
+
+async def test_create_user_falls_back_when_allocated_nickname_also_taken(db_session, email_service, user, monkeypatch):
+    allocations = []
+
+    async def allocate_taken_nickname(session):
+        allocations.append(1)
+        return user.nickname  # another registration got it first
+
+    monkeypatch.setattr("app.services.user_service.generate_nickname", lambda digits: user.nickname)
+    monkeypatch.setattr(UserService, "allocate_nickname", allocate_taken_nickname)
+    new_user = await UserService.create(db_session, {"email": "other@example.com", "password": "ValidPassword123!"}, email_service)
+    assert new_user.nickname.startswith(f"{user.nickname}_")
+    assert len(allocations) == 1
+
 # Test creating a user with invalid data
 async def test_create_user_with_invalid_data(db_session, email_service):
     user_data = {
@@ -54,6 +92,11 @@ async def test_get_by_email_user_exists(db_session, user):
     retrieved_user = await UserService.get_by_email(db_session, user.email)
     assert retrieved_user.email == user.email
 
+async def test_get_by_email_ignores_case(db_session, user, sql_statements):
+    retrieved_user = await UserService.get_by_email(db_session, user.email.upper())
+    assert retrieved_user.id == user.id
+    assert "lower(users.email) = lower(" in sql_statements[0]
+
 # Test fetching a user by email when the user does not exist
 async def test_get_by_email_user_does_not_exist(db_session):
     retrieved_user = await UserService.get_by_email(db_session, "non_existent_email@example.com")
@@ -90,6 +133,27 @@ async def test_list_users_with_pagination(db_session, users_with_same_role_50_us
     assert len(users_page_2) == 10
     assert users_page_1[0].id != users_page_2[0].id
 
+async def test_list_users_keyset_walks_forward_and_back(db_session, users_with_same_role_50_users):
+    expected = [user.id for user in await UserService.list_users(db_session, skip=0, limit=50)]
+    pages, cursor = [], None
+    while True:
+        users, next_cursor, prev_cursor = await UserService.list_users_keyset(db_session, limit=15, cursor=cursor)
+        assert (prev_cursor is None) == (cursor is None)
+        pages.append((users, prev_cursor))
+        if next_cursor is None:
+            break
+        cursor = next_cursor
+    assert [user.id for users, _ in pages for user in users] == expected
+    assert [len(users) for users, _ in pages] == [15, 15, 15, 5]
+
+    users, next_cursor, prev_cursor = await UserService.list_users_keyset(db_session, limit=15, cursor=pages[-1][1])
+    assert [user.id for user in users] == [user.id for user in pages[-2][0]]
+    assert next_cursor is not None and prev_cursor is not None
+
+async def test_list_users_keyset_rejects_bad_cursor(db_session):
+    with pytest.raises(ValueError):
+        await UserService.list_users_keyset(db_session, cursor="not-a-cursor")
+
 # Test registering a user with valid data
 async def test_register_user_with_valid_data(db_session, email_service):
     user_data = {
@@ -118,6 +182,23 @@ async def test_login_user_successful(db_session, verified_user):
     logged_in_user = await UserService.login_user(db_session, user_data["email"], user_data["password"])
     assert logged_in_user is not None
 
+# Test that a successful login moves the stored hash to the configured cost
+async def test_login_user_rehashes_on_cost_change(db_session, verified_user, monkeypatch):
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    logged_in_user = await UserService.login_user(db_session, verified_user.email, "MySuperPassword$1234")
+    assert logged_in_user is not None
+    await db_session.refresh(logged_in_user)
+    assert get_hash_rounds(logged_in_user.hashed_password) == 4
+    assert verify_password("MySuperPassword$1234", logged_in_user.hashed_password)
+
+# Test that a failed login leaves the stored hash alone
+async def test_login_user_failed_does_not_rehash(db_session, verified_user, monkeypatch):
+    original_hash = verified_user.hashed_password
+    monkeypatch.setattr(settings, "bcrypt_rounds", 4)
+    assert await UserService.login_user(db_session, verified_user.email, "WrongPassword!") is None
+    await db_session.refresh(verified_user)
+    assert verified_user.hashed_password == original_hash
+
 # Test user login with incorrect email
 async def test_login_user_incorrect_email(db_session):
     user = await UserService.login_user(db_session, "nonexistentuser@noway.com", "Password123!")
@@ -137,6 +218,38 @@ async def test_account_lock_after_failed_logins(db_session, verified_user):
     is_locked = await UserService.is_account_locked(db_session, verified_user.email)
     assert is_locked, "The account should be locked after the maximum number of failed login attempts."
 
+# Test that a wrong password costs one SELECT and one atomic UPDATE
+async def test_authenticate_failed_login_round_trips(db_session, verified_user, sql_statements):
+    user, locked = await UserService.authenticate(db_session, verified_user.email, "wrongpassword")
+    assert user is None and locked is False
+    assert len(sql_statements) == 2
+    assert sql_statements[0].lstrip().upper().startswith("SELECT")
+    assert "coalesce(users.failed_login_attempts" in sql_statements[1]
+    assert "RETURNING" in sql_statements[1]
+    assert verified_user.failed_login_attempts == 1
+
+# Test that the lock is reported on the next attempt, before any password check
+async def test_authenticate_reports_locked_account(db_session, verified_user, mocker):
+    for _ in range(get_settings().max_login_attempts):
+        await UserService.authenticate(db_session, verified_user.email, "wrongpassword")
+    verify_spy = mocker.patch("app.services.user_service.verify_password_async")
+    user, locked = await UserService.authenticate(db_session, verified_user.email, "MySuperPassword$1234")
+    assert user is None and locked is True
+    verify_spy.assert_not_called()
+
+# Test that concurrent failures are all counted
+async def test_authenticate_counts_concurrent_failures(db_session, verified_user):
+    from tests.conftest import AsyncTestingSessionLocal
+    import asyncio
+
+    async def fail_once():
+        async with AsyncTestingSessionLocal() as session:
+            await UserService.authenticate(session, verified_user.email, "wrongpassword")
+
+    await asyncio.gather(fail_once(), fail_once())
+    await db_session.refresh(verified_user)
+    assert verified_user.failed_login_attempts == 2
+
 # Test resetting a user's password
 async def test_reset_password(db_session, user):
     new_password = "NewPassword123!"
@@ -157,3 +270,90 @@ async def test_unlock_user_account(db_session, locked_user):
     assert unlocked, "The account should be unlocked"
     refreshed_user = await UserService.get_by_id(db_session, locked_user.id)
     assert not refreshed_user.is_locked, "The user should no longer be locked"
+
+async def set_counter(db_session, enabled):
+    connection = await db_session.connection()
+    changed = await connection.run_sync(set_user_counter_enabled, enabled)
+    await db_session.commit()
+    return changed
+
+async def test_total_count_counter_tracks_inserts_and_deletes(db_session, users_with_same_role_50_users):
+    assert await set_counter(db_session, True)
+    assert await UserService.total_count(db_session, "counter") == (50, True)
+    await db_session.execute(delete(User).where(User.id.in_([u.id for u in users_with_same_role_50_users[:5]])))
+    await db_session.commit()
+    assert await UserService.total_count(db_session, "counter") == (45, True)
+    assert await UserService.count(db_session) == 45
+
+async def test_counter_triggers_only_installed_when_enabled(db_session, user):
+    # Off by default: no counter row to lock, and the counter strategy counts exactly.
+    assert await UserService.total_count(db_session, "counter") == (1, True)
+    assert not await set_counter(db_session, False)
+    assert await set_counter(db_session, True)
+    assert not await set_counter(db_session, True)
+    assert await set_counter(db_session, False)
+    assert await UserService.total_count(db_session, "counter") == (1, True)
+
+async def test_total_count_estimate_falls_back_to_exact_for_small_tables(db_session, users_with_same_role_50_users):
+    assert await UserService.total_count(db_session, "estimate") == (50, True)
+
+async def test_total_count_cached_reuses_count_within_ttl(db_session, users_with_same_role_50_users, monkeypatch):
+    monkeypatch.setattr(UserService, "_cached_count", None)
+    assert await UserService.total_count(db_session, "cached") == (50, True)
+    await db_session.execute(delete(User))
+    await db_session.commit()
+    assert await UserService.total_count(db_session, "cached") == (50, False)
+    monkeypatch.setattr(UserService, "_cached_count", (50, 0.0))
+    assert await UserService.total_count(db_session, "cached") == (0, True)
+
+async def test_list_user_rows_selects_only_response_columns(db_session, users_with_same_role_50_users, sql_statements):
+    rows = await UserService.list_user_rows(db_session, skip=0, limit=10)
+    assert "hashed_password" not in sql_statements[0]
+    assert [row.id for row in rows] == [user.id for user in await UserService.list_users(db_session, 0, 10)]
+    assert "hashed_password" not in rows[0]._mapping
+    assert not isinstance(rows[0], User)
+
+async def test_get_user_row(db_session, user):
+    row = await UserService.get_user_row(db_session, user.id)
+    assert row.email == user.email
+    assert "verification_token" not in row._mapping
+    assert await UserService.get_user_row(db_session, uuid4()) is None
+
+async def test_allocate_nickname_checks_candidates_in_one_query(db_session, user, sql_statements, monkeypatch):
+    candidates = [user.nickname, "free_nickname_1", "free_nickname_2"]
+    monkeypatch.setattr("app.services.user_service.generate_nickname_candidates", lambda count, digits: candidates)
+    assert await UserService.allocate_nickname(db_session) == "free_nickname_1"
+    assert len(sql_statements) == 1
+
+async def test_allocate_nickname_bounded_when_candidates_taken(db_session, user, sql_statements, monkeypatch):
+    monkeypatch.setattr("app.services.user_service.generate_nickname_candidates", lambda count, digits: [user.nickname])
+    nickname = await UserService.allocate_nickname(db_session)
+    assert nickname != user.nickname
+    assert len(sql_statements) == get_settings().nickname_max_batches
+
+async def test_get_user_rows_by_ids_single_query(db_session, users_with_same_role_50_users, sql_statements):
+    ids = [user.id for user in users_with_same_role_50_users[:5]] + [uuid4()]
+    rows = await UserService.get_user_rows_by_ids(db_session, ids)
+    assert set(rows) == set(ids[:5])
+    assert len(sql_statements) == 1
+    assert "= ANY (" in sql_statements[0]
+
+async def test_list_users_filters(db_session, users_with_same_role_50_users, admin_user, locked_user):
+    admins = await UserService.list_users(db_session, 0, 100, UserFilter(role="ADMIN"))
+    assert [user.id for user in admins] == [admin_user.id]
+    locked = await UserService.list_user_rows(db_session, 0, 100, UserFilter(is_locked=True))
+    assert [row.id for row in locked] == [locked_user.id]
+    assert await UserService.count(db_session, UserFilter(role="AUTHENTICATED")) == 51  # 50 + locked_user
+    assert await UserService.total_count(db_session, "estimate", UserFilter(role="ADMIN")) == (1, True)
+
+async def test_list_users_search(db_session, user, admin_user):
+    rows = await UserService.list_user_rows(db_session, 0, 10, UserFilter(search=user.nickname.upper()))
+    assert [row.id for row in rows] == [user.id]
+    # LIKE wildcards in the term are matched literally.
+    assert await UserService.count(db_session, UserFilter(search="%")) == 0
+
+async def test_list_users_keyset_with_filters(db_session, users_with_same_role_50_users, admin_user):
+    users, next_cursor, _ = await UserService.list_users_keyset(db_session, 30, filters=UserFilter(role="AUTHENTICATED"))
+    assert len(users) == 30 and all(user.role == UserRole.AUTHENTICATED for user in users)
+    rest, next_cursor, _ = await UserService.list_users_keyset(db_session, 30, next_cursor, filters=UserFilter(role="AUTHENTICATED"))
+    assert len(rest) == 20 and next_cursor is None
@@ -0,0 +1,46 @@
+# test_loop_monitor.py
+from builtins import next
+import asyncio
+import logging
+import time
+import pytest
+from app.utils.loop_monitor import LoopLagMonitor, blocked_total, lag_seconds
+from app.utils.metrics import REGISTRY
+
+@pytest.fixture
+async def monitor():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    yield monitor
+    await monitor.stop()
+
+def render_smtp_synchronously():
+    time.sleep(0.2)  # stands in for a sync call made on the event loop
+
+async def test_captures_stack_of_blocking_call(monitor, caplog):
+    blocked = blocked_total.value()
+    await asyncio.sleep(0.03)
+    render_smtp_synchronously()
+    await asyncio.sleep(0.03)
+    assert monitor.blocked_count >= 1  # one per stall; a busy machine may add its own
+    assert blocked_total.value() >= blocked + 1
+    assert "render_smtp_synchronously" in monitor.last_blocked_stack
+    assert "test_captures_stack_of_blocking_call" in monitor.last_blocked_stack
+    record = next(record for record in caplog.records if "render_smtp_synchronously" in record.getMessage())
+    assert record.levelno == logging.WARNING
+    assert record.loop_blocked_ms >= 50
+
+async def test_publishes_lag_quantiles(monitor):
+    observed = lag_seconds.count()
+    await asyncio.sleep(0.1)
+    assert lag_seconds.count() > observed
+    body = REGISTRY.render()
+    assert 'event_loop_lag_recent_seconds{quantile="0.99"}' in body
+    assert "# TYPE event_loop_lag_seconds histogram" in body
+
+async def test_stop_clears_recent_quantiles():
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.03)
+    await monitor.stop()
+    assert 'event_loop_lag_recent_seconds{' not in REGISTRY.render()
@@ -0,0 +1,45 @@
+# test_metrics.py
+import pytest
+from app.utils.metrics import Counter, Gauge, Histogram, Registry
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+def test_counter_and_gauge_render(registry):
+    sent = Counter("sent_total", "Sent.", ["kind"], registry=registry)
+    sent.inc(kind='say "hi"')
+    sent.inc(2, kind='say "hi"')
+    in_flight = Gauge("in_flight", "In flight.", registry=registry)
+    in_flight.inc()
+    in_flight.dec()
+    Gauge("pending", "Pending.", collect=lambda: {(): 4}, registry=registry)
+    assert registry.render().splitlines() == [
+        "# HELP sent_total Sent.",
+        "# TYPE sent_total counter",
+        'sent_total{kind="say \\"hi\\""} 3.0',
+        "# HELP in_flight In flight.",
+        "# TYPE in_flight gauge",
+        "in_flight 0.0",
+        "# HELP pending Pending.",
+        "# TYPE pending gauge",
+        "pending 4.0",
+    ]
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = Histogram("latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, route="get_user")
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="get_user",le="0.1"} 1.0' in lines
+    assert 'latency_seconds_bucket{route="get_user",le="1.0"} 2.0' in lines
+    assert 'latency_seconds_bucket{route="get_user",le="+Inf"} 3.0' in lines
+    assert 'latency_seconds_sum{route="get_user"} 5.55' in lines
+    assert 'latency_seconds_count{route="get_user"} 3.0' in lines
+
+def test_labels_must_match(registry):
+    sent = Counter("sent_total", "Sent.", ["kind"], registry=registry)
+    with pytest.raises(ValueError):
+        sent.inc(type="x")
+    with pytest.raises(ValueError):
+        Counter("sent_total", "Again.", registry=registry)
@@ -0,0 +1,16 @@
+import re
+from app.utils.nickname_gen import generate_nickname, generate_nickname_candidates, nickname_space
+
+def test_generate_nickname_is_url_safe():
+    assert re.fullmatch(r"[a-z]+_[a-z]+_\d{1,4}", generate_nickname())
+
+def test_nickname_space_grows_with_suffix_digits():
+    assert nickname_space(4) == 64 * 64 * 10_000
+    assert nickname_space(5) == 10 * nickname_space(4)
+
+def test_generate_nickname_candidates_are_distinct():
+    candidates = generate_nickname_candidates(50)
+    assert len(candidates) == len(set(candidates)) == 50
+
+def test_generate_nickname_candidates_capped_by_space():
+    assert len(generate_nickname_candidates(10_000, suffix_digits=0)) == nickname_space(0)
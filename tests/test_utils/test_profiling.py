@@ -0,0 +1,35 @@
+# test_profiling.py
+from builtins import any, list, range
+import pstats
+import pytest
+from httpx import AsyncClient
+from app.main import app
+from app.utils.profiling import ProfilingMiddleware
+
+@pytest.fixture
+async def profiled_client(async_client, tmp_path):
+    """The application (with the async_client overrides) behind a fresh ProfilingMiddleware."""
+    middleware = ProfilingMiddleware(app, str(tmp_path))
+    async with AsyncClient(app=middleware, base_url="http://testserver") as client:
+        yield client, middleware
+
+async def test_samples_one_in_n_per_route(profiled_client, tmp_path, admin_user, admin_token):
+    client, middleware = profiled_client
+    middleware.sample_every = 2
+    for _ in range(4):
+        response = await client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 200
+    assert [path.name for path in tmp_path.iterdir()] == ["get_user.prof"]
+    stats = pstats.Stats(str(tmp_path / "get_user.prof"))
+    assert any(function == "get_user" for _, _, function in stats.stats)
+    assert stats.total_calls > 0
+
+async def test_profile_header_requires_admin(profiled_client, tmp_path, admin_user, admin_token, user_token):
+    client, _ = profiled_client
+    url = f"/users/{admin_user.id}"
+    await client.get(url, headers={"Authorization": f"Bearer {user_token}", "X-Profile": "1"})
+    assert not list(tmp_path.iterdir())
+    await client.get(url, headers={"Authorization": f"Bearer {admin_token}"})
+    assert not list(tmp_path.iterdir())
+    await client.get(url, headers={"Authorization": f"Bearer {admin_token}", "X-Profile": "1"})
+    assert (tmp_path / "get_user.prof").exists()
@@ -0,0 +1,53 @@
+# test_rate_limiter.py
+import pytest
+from app.utils.rate_limiter import InMemoryRateLimitStore, SlidingWindowRateLimiter, SQLiteRateLimitStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def limiter(request, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteRateLimitStore(str(tmp_path / "rate_limit.sqlite3"))
+    else:
+        store = InMemoryRateLimitStore()
+    return SlidingWindowRateLimiter(store, window_seconds=60)
+
+def test_allows_up_to_limit(limiter):
+    assert [limiter.hit("ip:1", 3, now=100 + i) for i in range(3)] == [0, 0, 0]
+    assert limiter.hit("ip:1", 3, now=103) == pytest.approx(57)
+
+def test_window_slides(limiter):
+    for i in range(3):
+        limiter.hit("ip:1", 3, now=100 + i)
+    assert limiter.hit("ip:1", 3, now=150) > 0
+    # The first hit leaves the window after 60 seconds
+    assert limiter.hit("ip:1", 3, now=160.5) == 0
+    assert limiter.hit("ip:1", 3, now=160.6) > 0
+
+def test_keys_are_independent(limiter):
+    limiter.hit("ip:1", 1, now=100)
+    assert limiter.hit("ip:1", 1, now=101) > 0
+    assert limiter.hit("ip:2", 1, now=101) == 0
+
+def test_reset_and_clear(limiter):
+    limiter.hit("ip:1", 1, now=100)
+    limiter.store.reset("ip:1")
+    assert limiter.hit("ip:1", 1, now=101) == 0
+    limiter.store.clear()
+    assert limiter.hit("ip:1", 1, now=102) == 0
+
+def test_memory_store_evicts_least_recently_used_key():
+    limiter = SlidingWindowRateLimiter(InMemoryRateLimitStore(max_keys=2), window_seconds=60)
+    limiter.hit("a", 1, now=100)
+    limiter.hit("b", 1, now=100)
+    limiter.hit("a", 1, now=101)
+    limiter.hit("c", 1, now=101)
+    # "a" was used more recently than "b", so "b" was evicted and starts over
+    assert limiter.hit("a", 1, now=102) > 0
+    assert limiter.hit("b", 1, now=102) == 0
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "rate_limit.sqlite3")
+    first = SlidingWindowRateLimiter(SQLiteRateLimitStore(path), window_seconds=60)
+    second = SlidingWindowRateLimiter(SQLiteRateLimitStore(path), window_seconds=60)
+    first.hit("user:john", 2, now=100)
+    second.hit("user:john", 2, now=101)
+    assert first.hit("user:john", 2, now=102) > 0
@@ -0,0 +1,59 @@
+# test_sql_instrumentation.py
+from builtins import float, int, len, range
+import logging
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import AsyncClient
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user_model import User
+from app.utils.sql_instrumentation import SQLInstrumentation, SQLStatsMiddleware, current_sql_stats
+
+@pytest.fixture
+def instrumented(db_session):
+    sync_engine = db_session.bind.sync_engine
+    instrumentation = SQLInstrumentation(slow_query_ms=10_000)
+    instrumentation.attach(sync_engine)
+    yield instrumentation
+    instrumentation.detach(sync_engine)
+
+@pytest.fixture
+def stats_app(db_session, instrumented):
+    """A one-route app that looks users up one at a time, the shape of an N+1."""
+    api = FastAPI()
+
+    @api.get("/lookups/{count}")
+    async def lookups(count: int, session: AsyncSession = Depends(lambda: db_session)):
+        for _ in range(count):
+            await session.execute(select(User.id).where(User.nickname == "nobody"))
+        return {"statements": current_sql_stats().statements}
+
+    return SQLStatsMiddleware(api, headers=True, repeat_threshold=3)
+
+async def test_stats_headers_and_log_fields(stats_app, caplog):
+    caplog.set_level(logging.INFO, logger="app.utils.sql_instrumentation")
+    async with AsyncClient(app=stats_app, base_url="http://testserver") as client:
+        response = await client.get("/lookups/2")
+    assert response.json() == {"statements": 2}
+    assert response.headers["x-db-query-count"] == "2"
+    assert float(response.headers["x-db-time-ms"]) > 0
+    assert response.headers["server-timing"].startswith("db;dur=")
+    summary = [record for record in caplog.records if "statements in" in record.getMessage()]
+    assert summary[0].db_statements == 2
+    assert summary[0].status_code == 200
+    assert not [record for record in caplog.records if "N+1" in record.getMessage()]
+
+async def test_repeated_statement_flagged(stats_app, caplog):
+    async with AsyncClient(app=stats_app, base_url="http://testserver") as client:
+        await client.get("/lookups/3")
+    flagged = [record for record in caplog.records if "N+1" in record.getMessage()]
+    assert len(flagged) == 1
+    assert flagged[0].repeats == 3
+    assert "users.nickname" in flagged[0].statement
+
+async def test_slow_query_logged_without_request(db_session, instrumented, caplog):
+    instrumented.slow_query_seconds = 0
+    await db_session.execute(text("SELECT 1"))
+    slow = [record for record in caplog.records if record.name == "app.utils.sql_instrumentation.slow"]
+    assert slow and slow[0].statement == "SELECT 1"
+    assert current_sql_stats() is None
@@ -0,0 +1,122 @@
+# test_tracing.py
+from builtins import ValueError, all, len, next, open, range
+import json
+import logging
+import threading
+import pytest
+from app.utils.tracing import (
+    BackgroundExporter, InMemoryExporter, JSONFileExporter, SQLTracing, TraceContextFilter, otlp_payload, traces_dropped,
+    tracer,
+)
+
+@pytest.fixture
+def exporter(db_session):
+    exporter = InMemoryExporter()
+    sql_tracing = SQLTracing()
+    sql_tracing.attach(db_session.bind.sync_engine)
+    tracer.exporters = [exporter]
+    yield exporter
+    tracer.exporters = []
+    sql_tracing.detach(db_session.bind.sync_engine)
+
+def by_name(spans, name):
+    return next(span for span in spans if span.name == name)
+
+async def test_request_span_tree(async_client, exporter, admin_token):
+    user_data = {"email": "traced@example.com", "password": "Secure*1234", "nickname": "traced_user"}
+    response = await async_client.post("/users/", json=user_data, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 201
+    spans = exporter.spans
+    root = spans[0]
+    assert root.name == "create_user" and root.parent_id is None
+    assert root.attributes["http.status_code"] == 201
+    assert response.headers["x-trace-id"] == root.trace_id
+    assert {span.trace_id for span in spans} == {root.trace_id}
+
+    service = by_name(spans, "UserService.create")
+    insert = next(span for span in spans if span.layer == "db" and span.name == "INSERT")
+    email = by_name(spans, "EmailService.send_user_email")
+    smtp = by_name(spans, "SMTP send")
+    assert service.parent_id == root.span_id
+    assert insert.parent_id == service.span_id
+    assert email.parent_id == service.span_id
+    assert smtp.parent_id == email.span_id
+    assert all(span.end_ns >= span.start_ns for span in spans)
+
+async def test_traceparent_is_continued(async_client, exporter, admin_user, admin_token):
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    await async_client.get(
+        f"/users/{admin_user.id}",
+        headers={"Authorization": f"Bearer {admin_token}", "traceparent": f"00-{trace_id}-{parent_id}-01"},
+    )
+    root = exporter.spans[0]
+    assert (root.trace_id, root.parent_id, root.name) == (trace_id, parent_id, "get_user")
+
+async def test_no_spans_when_disabled(async_client, admin_user, admin_token):
+    response = await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {admin_token}"})
+    assert "x-trace-id" not in response.headers
+
+def test_log_records_carry_trace_id(exporter):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "message", None, None)
+    with tracer.span("work") as span:
+        TraceContextFilter().filter(record)
+    assert (record.trace_id, record.span_id) == (span.trace_id, span.span_id)
+    TraceContextFilter().filter(record)
+    assert record.trace_id == "-"
+
+def test_json_file_exporter(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    file_exporter = JSONFileExporter(str(path))
+    tracer.exporters = [file_exporter]
+    try:
+        with tracer.span("outer"):
+            with tracer.span("inner", "db"):
+                pass
+        file_exporter.flush()
+    finally:
+        tracer.exporters = []
+    with open(path) as file:
+        lines = [json.loads(line) for line in file]
+    assert [line["name"] for line in lines] == ["outer", "inner"]
+    assert lines[1]["parent_id"] == lines[0]["span_id"]
+
+class BlockingExporter(BackgroundExporter):
+    """Holds its first write until released, so later traces pile up in the queue."""
+
+    def __init__(self, **kwargs):
+        self.writing = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+        super().__init__(**kwargs)
+
+    def _write(self, spans):
+        self.writing.set()
+        self.release.wait(5)
+        self.batches.append(len(spans))
+
+def test_background_exporter_bounds_queue_and_batches():
+    blocking = BlockingExporter(max_queue=3)
+    dropped = traces_dropped.value(exporter="BlockingExporter")
+    blocking.export(["first"])
+    assert blocking.writing.wait(5)
+    for _ in range(5):
+        blocking.export(["span", "span"])
+    assert traces_dropped.value(exporter="BlockingExporter") == dropped + 2
+    blocking.release.set()
+    blocking.flush()
+    assert blocking.batches == [1, 6]
+
+def test_otlp_payload(exporter):
+    with tracer.span("outer", "http", attempts=2):
+        with pytest.raises(ValueError):
+            with tracer.span("inner", "db"):
+                raise ValueError("boom")
+    payload = otlp_payload(exporter.spans, "event_manager")
+    resource_spans = payload["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "event_manager"}
+    outer, inner = resource_spans["scopeSpans"][0]["spans"]
+    assert outer["kind"] == 2 and "parentSpanId" not in outer
+    assert {"key": "attempts", "value": {"intValue": "2"}} in outer["attributes"]
+    assert inner["parentSpanId"] == outer["spanId"]
+    assert inner["status"] == {"code": 2, "message": "ValueError: boom"}
+    assert len(inner["traceId"]) == 32 and len(inner["spanId"]) == 16